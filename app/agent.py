@@ -3,9 +3,15 @@ from openai import OpenAI
 import json
 import os
 import logging
+import time
 
 # Ferramenta de acesso ao Google Sheets
-from tools.google_sheets import google_sheets_query, SheetsQueryParams
+from tools.google_sheets import google_sheets_query, SheetsQueryParams, SheetsQueryError, DEFAULT_SHEET_NAME
+from tools.range_planner import google_sheets_lookup, SheetsLookupParams
+from tools.sheet_history import google_sheets_diff, SheetsDiffParams, schedule_snapshot
+from app.routing import ModelRouter
+from app.context import ContextBudget
+from tools.timing import phase
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -37,6 +43,12 @@ except Exception as e:
     logger.error(f"Failed to initialize OpenAI client: {str(e)}")
     raise
 
+# Routes each round to the fast or large model tier
+router = ModelRouter()
+
+# Per-request prompt token budget
+context_budget = ContextBudget()
+
 SYSTEM_INSTRUCTIONS = """
 You answer finance questions using Google Sheets and your own reasoning.
 1. Use A1 notation to fetch data (e.g. 'Sheet1!A1:Z50')
@@ -156,50 +168,140 @@ An AI agent that follows this guide will be able to:
 * **Non‑tech** – Outsourced or external professional services.
 * **Ad‑hoc COGS / Hardwares / Travel & Events** – One‑off expenses that do not repeat monthly.
 
-When querying, use 'Sheet1!A1:AF100' to get the complete financial model structure.
+When you need specific lines and months, call google_sheets_lookup with the labels exactly as
+they appear in column C and a period such as 'Jan–Mar/25'; it fetches only those cells. Labels
+such as SOFTWARE or Technology repeat under several lines: each returned row carries its macro and
+micro columns, and you can pass macro and/or micro to keep only one of them. Read the notes field:
+it says when a label had no exact match and was matched ignoring case or by substring. Only use
+google_sheets_query with 'Sheet1!A1:AF100' when you need the complete financial model structure.
+For questions about how numbers changed over time (e.g. "how did the March forecast change since
+last week?"), call google_sheets_diff with base set to a date or 'previous'.
 """
 
-def run(question: str) -> str:
-    logger.info(f"Processing question: {question}")
-    
-    tools = [{
-        "type": "function",
-        "function": {
-            "name": "google_sheets_query",
-            "description": "Query Google Sheets data using A1 notation range.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "spreadsheet_id": {
-                        "type": "string",
-                        "description": "Google Sheets file ID",
-                        "default": DEFAULT_SHEET_ID
-                    },
-                    "a1_range": {
-                        "type": "string",
-                        "description": "A1 notation range (e.g. 'Sheet1!A1:Z50')",
-                        "default": "Sheet1!A1:AF200"
-                    }
+# Tool schema; kept static and sent after the system prompt so the whole prefix
+# is identical for every request and eligible for provider-side prompt caching
+TOOLS = [{
+    "type": "function",
+    "function": {
+        "name": "google_sheets_query",
+        "description": "Query Google Sheets data using A1 notation range.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "spreadsheet_id": {
+                    "type": "string",
+                    "description": "Google Sheets file ID",
+                    "default": DEFAULT_SHEET_ID
                 },
-                "required": ["spreadsheet_id"]
-            }
+                "a1_range": {
+                    "type": "string",
+                    "description": "A1 notation range (e.g. 'Sheet1!A1:Z50')",
+                    "default": "Sheet1!A1:AF200"
+                }
+            },
+            "required": ["spreadsheet_id"]
         }
-    }]
+    }
+}, {
+    "type": "function",
+    "function": {
+        "name": "google_sheets_lookup",
+        "description": "Fetch only the given row labels and months from the financial model.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "spreadsheet_id": {
+                    "type": "string",
+                    "description": "Google Sheets file ID",
+                    "default": DEFAULT_SHEET_ID
+                },
+                "labels": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Row labels from column C (e.g. ['Revenue', 'NET INCOME'])"
+                },
+                "period": {
+                    "type": "string",
+                    "description": "Months to return (e.g. 'Jan–Mar/25', 'Q1/25', 'Dec/24'); all months when omitted"
+                },
+                "macro": {
+                    "type": "string",
+                    "description": "Only rows under this macro line (e.g. 'COGS', 'Expenses')"
+                },
+                "micro": {
+                    "type": "string",
+                    "description": "Only rows under this ALL CAPS micro line (e.g. 'SOFTWARE')"
+                }
+            },
+            "required": ["labels"]
+        }
+    }
+}, {
+    "type": "function",
+    "function": {
+        "name": "google_sheets_diff",
+        "description": "Compare two stored revisions of a range and list the cells that changed.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "spreadsheet_id": {
+                    "type": "string",
+                    "description": "Google Sheets file ID",
+                    "default": DEFAULT_SHEET_ID
+                },
+                "a1_range": {
+                    "type": "string",
+                    "description": "Only compare cells in this range (e.g. 'Sheet1!E1:H90'); whole sheet when omitted"
+                },
+                "base": {
+                    "type": "string",
+                    "description": "Older revision: 'previous', a revision ID, or an ISO date (newest revision on or before it)"
+                },
+                "target": {
+                    "type": "string",
+                    "description": "Newer revision: 'current' (default), 'latest', a revision ID or an ISO date",
+                    "default": "current"
+                }
+            },
+            "required": ["base"]
+        }
+    }
+}]
+
+
+def run(question: str) -> str:
+    # Registers the worker thread with the profiler when the request is profiled
+    with phase("agent"):
+        return _run(question)
+
 
+def _run(question: str) -> str:
+    logger.info(f"Processing question: {question}")
+    
     messages = [
         {"role": "system", "content": SYSTEM_INSTRUCTIONS},
         {"role": "user", "content": question}
     ]
 
     try:
+        round_index = 0
         while True:
-            logger.info("Making API call to OpenAI")
-            response = client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=messages,
-                tools=tools,
-                tool_choice="auto"
-            )
+            tier = router.select_tier(question, round_index)
+            model = router.model_for(tier)
+            # Keep the prompt within budget by summarising the oldest tool results
+            estimated_tokens, evicted = context_budget.fit(messages, TOOLS)
+            logger.info(f"Making API call to OpenAI (round {round_index}, {tier} tier, model {model})")
+            started = time.perf_counter()
+            with phase("openai"):
+                response = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    tools=TOOLS,
+                    tool_choice="auto"
+                )
+            router.record(tier, time.perf_counter() - started, getattr(response, "usage", None))
+            context_budget.record(round_index, estimated_tokens, evicted, getattr(response, "usage", None))
+            round_index += 1
             logger.info("Received response from OpenAI")
 
             response_message = response.choices[0].message
@@ -209,28 +311,59 @@ def run(question: str) -> str:
                 return response_message.content
 
             # Handle function calls
+            messages.append({
+                "role": "assistant",
+                "content": response_message.content,
+                "tool_calls": response_message.tool_calls
+            })
             for tool_call in response_message.tool_calls:
+                # Parse the function arguments
+                function_args = json.loads(tool_call.function.arguments)
+
                 if tool_call.function.name == "google_sheets_query":
                     logger.info("Processing Google Sheets query")
-                    # Parse the function arguments
-                    function_args = json.loads(tool_call.function.arguments)
-                    
                     # Create a SheetsQueryParams instance and call the function
                     params = SheetsQueryParams(**function_args)
-                    function_response = google_sheets_query(params)
+                    result = google_sheets_query(params)
+                    with phase("json_encode"):
+                        content = result.to_json_bytes().decode()
                     logger.info("Google Sheets query completed successfully")
-                    
-                    # Add the function response to the messages
-                    messages.append({
-                        "role": "assistant",
-                        "content": None,
-                        "tool_calls": [tool_call]
-                    })
-                    messages.append({
-                        "role": "tool",
-                        "tool_call_id": tool_call.id,
-                        "content": json.dumps(function_response.dict())
-                    })
+                    # Keep a sheet-level snapshot of every revision read, for google_sheets_diff
+                    sheet, _, _ = params.a1_range.rpartition("!")
+                    schedule_snapshot(params.spreadsheet_id, sheet.strip("'") or DEFAULT_SHEET_NAME)
+                elif tool_call.function.name == "google_sheets_lookup":
+                    logger.info("Processing Google Sheets lookup")
+                    try:
+                        params = SheetsLookupParams(**function_args)
+                        result = google_sheets_lookup(params)
+                        with phase("json_encode"):
+                            content = result.to_json_bytes().decode()
+                        logger.info("Google Sheets lookup completed successfully")
+                        schedule_snapshot(params.spreadsheet_id, params.sheet_name)
+                    except SheetsQueryError as e:
+                        # Let the model correct unknown labels or months and retry
+                        logger.warning(f"Google Sheets lookup failed: {str(e)}")
+                        content = json.dumps({"error": str(e)})
+                elif tool_call.function.name == "google_sheets_diff":
+                    logger.info("Processing Google Sheets diff")
+                    try:
+                        params = SheetsDiffParams(**function_args)
+                        result = google_sheets_diff(params)
+                        with phase("json_encode"):
+                            content = result.model_dump_json()
+                        logger.info("Google Sheets diff completed successfully")
+                    except SheetsQueryError as e:
+                        logger.warning(f"Google Sheets diff failed: {str(e)}")
+                        content = json.dumps({"error": str(e)})
+                else:
+                    content = json.dumps({"error": f"Unknown tool '{tool_call.function.name}'"})
+
+                # Add the function response to the messages
+                messages.append({
+                    "role": "tool",
+                    "tool_call_id": tool_call.id,
+                    "content": content
+                })
     except Exception as e:
         logger.error(f"Error in run function: {str(e)}", exc_info=True)
         raise
@@ -0,0 +1,266 @@
+"""Token-aware context budgeting for the agent loop.
+
+Every round re-sends the whole conversation, so prompt size grows with each
+tool result. ContextBudget counts tokens locally before each call and, when
+the hard budget is exceeded, replaces the oldest tool results with short
+summaries. If that is not enough, the results of the latest round are cut
+down to the rows that fit, and a prompt that still cannot fit fails the
+request with ContextBudgetError instead of being sent. The system prompt and
+tool schema are never touched, so the static prefix stays byte-identical
+across rounds and requests and can be served from the provider's prompt cache.
+"""
+
+import json
+import logging
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from configs.agent_config import CONTEXT_TOKEN_BUDGET
+
+logger = logging.getLogger(__name__)
+
+# Approximate chat-format overhead per message and for priming the reply
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_OVERHEAD_TOKENS = 3
+
+# Row labels kept in the summary of an evicted tool result
+SUMMARY_MAX_LABELS = 20
+
+
+class ContextBudgetError(Exception):
+    """Raised when a prompt cannot be reduced to fit the token budget."""
+    pass
+
+
+@lru_cache()
+def load_tokenizer():
+    """
+    The cl100k_base tokenizer, or None if tiktoken or its data is unavailable.
+
+    tiktoken downloads the encoding on first use unless TIKTOKEN_CACHE_DIR
+    already holds it, so the app loads it once at startup rather than on the
+    first request.
+    """
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(
+            f"tiktoken encoding unavailable, the context budget will use a rough "
+            f"~4 characters per token estimate: {str(e)}"
+        )
+        return None
+
+
+def count_tokens(text: Optional[str]) -> int:
+    """Count tokens in text with tiktoken, falling back to ~4 characters per token."""
+    if not text:
+        return 0
+    encoding = load_tokenizer()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def _tool_call_text(tool_call) -> str:
+    if isinstance(tool_call, dict):
+        function = tool_call.get("function", {})
+        return f"{function.get('name', '')}{function.get('arguments', '')}"
+    return f"{tool_call.function.name}{tool_call.function.arguments}"
+
+
+def message_tokens(message: Dict) -> int:
+    """Tokens a chat message contributes to the prompt."""
+    tokens = MESSAGE_OVERHEAD_TOKENS + count_tokens(message.get("content"))
+    for tool_call in message.get("tool_calls") or []:
+        tokens += count_tokens(_tool_call_text(tool_call))
+    return tokens
+
+
+def tools_tokens(tools: List[Dict]) -> int:
+    """Approximate tokens used by the tool schema."""
+    return count_tokens(json.dumps(tools, separators=(",", ":")))
+
+
+def summarize_tool_result(content: str) -> str:
+    """
+    Replace a tool result with a short, deterministic summary.
+
+    The summary keeps the shape of the result (row count, columns and the
+    first row labels) so the model can fetch it again if it still needs it.
+    """
+    summary: Dict = {"evicted": True}
+    try:
+        payload = json.loads(content)
+    except (TypeError, ValueError):
+        payload = None
+    if isinstance(payload, dict) and isinstance(payload.get("data"), list):
+        rows = payload["data"]
+        columns = payload.get("columns") or []
+        summary["rows"] = len(rows)
+        summary["columns"] = columns
+        label_column = next((c for c in columns if c not in ("row",)), None)
+        if label_column is not None:
+            summary["labels"] = [
+                row.get(label_column) for row in rows[:SUMMARY_MAX_LABELS] if isinstance(row, dict)
+            ]
+    summary["note"] = "Result removed to fit the context budget; call the tool again if you need it."
+    return json.dumps(summary)
+
+
+def truncate_tool_result(content: str, max_tokens: int) -> str:
+    """
+    Cut a tool result down to at most max_tokens, keeping whole leading rows.
+
+    Results that are not row data are cut by characters. Either way a note
+    tells the model the result is partial and how to get the rest.
+    """
+    note = "Result truncated to fit the context budget; request fewer rows or months to see the rest."
+    try:
+        payload = json.loads(content)
+    except (TypeError, ValueError):
+        payload = None
+    if isinstance(payload, dict) and isinstance(payload.get("data"), list):
+        rows = payload["data"]
+        # Notes on how rows were matched still apply to the rows that are kept
+        notes = {"notes": payload["notes"]} if payload.get("notes") else {}
+
+        def render(kept: int) -> str:
+            return json.dumps({
+                "data": rows[:kept],
+                "columns": payload.get("columns") or [],
+                **notes,
+                "truncated": True,
+                "total_rows": len(rows),
+                "note": note,
+            })
+
+        # Largest number of leading rows that fits
+        low, high = 0, len(rows)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if count_tokens(render(middle)) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return render(low)
+
+    text = content or ""
+    keep = max(max_tokens - count_tokens(note) - 2, 0) * 4
+    while keep > 0 and count_tokens(text[:keep]) + count_tokens(note) + 2 > max_tokens:
+        keep = keep * 3 // 4
+    return f"{text[:keep]}\n[{note}]"
+
+
+class ContextBudget:
+    """Enforce a per-request prompt token budget and record tokens per round."""
+
+    def __init__(self, budget: int = CONTEXT_TOKEN_BUDGET):
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._stats = {
+            "rounds": 0,
+            "prompt_tokens_estimated": 0,
+            "prompt_tokens_reported": 0,
+            "cached_tokens": 0,
+            "evicted_tool_results": 0,
+            "reduced_rounds": 0,
+        }
+
+    def fit(self, messages: List[Dict], tools: Optional[List[Dict]] = None) -> Tuple[int, int]:
+        """
+        Shrink messages in place until they fit the budget.
+
+        Tool results are summarised oldest first. Results from the latest
+        round are only reduced when that is not enough: the largest is
+        truncated to the rows that fit (or summarised if even one row does
+        not). System and user messages are never changed.
+
+        Args:
+            messages: The conversation about to be sent
+            tools: The tool schema sent alongside it
+
+        Returns:
+            Tuple of (estimated prompt tokens, number of tool results evicted
+            or truncated)
+
+        Raises:
+            ContextBudgetError: If the prompt still exceeds the budget
+        """
+        sizes = [message_tokens(message) for message in messages]
+        fixed = REPLY_OVERHEAD_TOKENS + (tools_tokens(tools) if tools else 0)
+        total = fixed + sum(sizes)
+        if total <= self.budget:
+            return total, 0
+
+        last_assistant = max(
+            (i for i, message in enumerate(messages) if message.get("role") == "assistant"),
+            default=len(messages),
+        )
+        evicted = 0
+        for i, message in enumerate(messages[:last_assistant]):
+            if total <= self.budget:
+                break
+            content = message.get("content")
+            if message.get("role") != "tool" or (content or "").startswith('{"evicted"'):
+                continue
+            message["content"] = summarize_tool_result(content)
+            new_size = message_tokens(message)
+            total -= sizes[i] - new_size
+            sizes[i] = new_size
+            evicted += 1
+
+        latest_results = sorted(
+            (i for i in range(last_assistant + 1, len(messages)) if messages[i].get("role") == "tool"),
+            key=lambda i: sizes[i],
+            reverse=True,
+        )
+        for i in latest_results:
+            if total <= self.budget:
+                break
+            message = messages[i]
+            allowed = sizes[i] - (total - self.budget) - MESSAGE_OVERHEAD_TOKENS
+            content = truncate_tool_result(message.get("content"), allowed)
+            if count_tokens(content) > allowed:
+                content = summarize_tool_result(message.get("content"))
+            logger.info(f"Truncated latest tool result from {sizes[i]} tokens to fit the budget")
+            message["content"] = content
+            new_size = message_tokens(message)
+            total -= sizes[i] - new_size
+            sizes[i] = new_size
+            evicted += 1
+
+        if total > self.budget:
+            raise ContextBudgetError(
+                f"Prompt needs {total} tokens after reducing tool results; the budget is {self.budget}"
+            )
+        return total, evicted
+
+    def record(self, round_index: int, estimated: int, evicted: int, usage: Optional[object] = None) -> None:
+        """Log and accumulate the token figures of one round."""
+        reported = getattr(usage, "prompt_tokens", 0) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", 0) or 0
+        logger.info(
+            f"Round {round_index}: {reported or estimated} prompt tokens "
+            f"(local estimate {estimated}, cached {cached}, evicted {evicted} tool results)"
+        )
+        with self._lock:
+            self._stats["rounds"] += 1
+            self._stats["prompt_tokens_estimated"] += estimated
+            self._stats["prompt_tokens_reported"] += reported
+            self._stats["cached_tokens"] += cached
+            self._stats["evicted_tool_results"] += evicted
+            # fit() raises rather than return an over-budget prompt, so count
+            # the rounds it had to shrink instead
+            self._stats["reduced_rounds"] += int(evicted > 0)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            rounds = self._stats["rounds"]
+            return {
+                "budget": self.budget,
+                **self._stats,
+                "avg_prompt_tokens": round(self._stats["prompt_tokens_estimated"] / rounds, 1) if rounds else 0.0,
+            }
@@ -0,0 +1,262 @@
+"""Asynchronous job queue for long-running agent questions.
+
+POST /api/jobs returns immediately with a job ID; a bounded pool of workers
+runs the agent and results are fetched by polling or delivered to a callback
+URL. Each priority lane has its own queue-depth limit, and submissions beyond
+it are shed with 429 and a Retry-After estimate instead of piling up.
+
+Runs execute on a dedicated thread pool with one thread per worker. A run
+that times out is reported as timed out right away, but its worker stays
+busy until the thread returns, so at most `workers` agent runs are ever
+calling OpenAI and Sheets at once.
+"""
+
+import asyncio
+import itertools
+import logging
+import math
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from configs.agent_config import JOB_QUEUE_LIMITS, JOB_RETENTION, JOB_TIMEOUT_S, JOB_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Lower value is dequeued first
+LANE_PRIORITY = {"interactive": 0, "batch": 1}
+
+# Assumed run time before any job has finished, used for Retry-After
+INITIAL_RUN_ESTIMATE_S = 10.0
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    TIMED_OUT = "timed_out"
+
+
+class QueueFullError(Exception):
+    """Raised when a lane is at its queue-depth limit."""
+
+    def __init__(self, lane: str, retry_after_s: int):
+        super().__init__(f"The {lane} queue is full; retry in {retry_after_s}s")
+        self.lane = lane
+        self.retry_after_s = retry_after_s
+
+
+@dataclass
+class Job:
+    """A queued agent question and its outcome."""
+    id: str
+    question: str
+    lane: str
+    callback_url: Optional[str] = None
+    status: JobStatus = JobStatus.QUEUED
+    result: Optional[str] = None
+    error: Optional[str] = None
+    callback_status: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status not in (JobStatus.QUEUED, JobStatus.RUNNING)
+
+    def timings(self) -> Dict[str, Optional[float]]:
+        def span(start: Optional[float], end: Optional[float]) -> Optional[float]:
+            return round(end - start, 4) if start is not None and end is not None else None
+
+        return {
+            "queue_wait_s": span(self.created_at, self.started_at),
+            "run_s": span(self.started_at, self.finished_at),
+            "total_s": span(self.created_at, self.finished_at),
+        }
+
+    def as_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "status": self.status.value,
+            "lane": self.lane,
+            "result": self.result,
+            "error": self.error,
+            "callback_status": self.callback_status,
+            "timings": self.timings(),
+        }
+
+
+class JobQueue:
+    """Bounded worker pool with per-lane admission control."""
+
+    def __init__(
+        self,
+        runner: Callable[[str], str],
+        workers: int = JOB_WORKERS,
+        lane_limits: Optional[Dict[str, int]] = None,
+        timeout_s: float = JOB_TIMEOUT_S,
+        retention: int = JOB_RETENTION,
+    ):
+        self.runner = runner
+        self.workers = workers
+        self.lane_limits = dict(lane_limits or JOB_QUEUE_LIMITS)
+        unknown = set(self.lane_limits) - set(LANE_PRIORITY)
+        if unknown:
+            raise ValueError(f"Unknown lanes: {', '.join(sorted(unknown))}")
+        self.timeout_s = timeout_s
+        self.retention = retention
+
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._sequence = itertools.count()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._depth = {lane: 0 for lane in self.lane_limits}
+        self._running = 0
+        self._overrunning = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._avg_run_s: Optional[float] = None
+        self._counters = {"submitted": 0, "shed": 0, "succeeded": 0, "failed": 0, "timed_out": 0}
+
+    async def start(self) -> None:
+        """Start the worker tasks on the running event loop."""
+        self._queue = asyncio.PriorityQueue()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="agent-job")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel the workers; queued jobs are left unfinished."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def retry_after(self) -> int:
+        """Estimate seconds until a slot frees up, from queue depth and average run time."""
+        run_s = self._avg_run_s or INITIAL_RUN_ESTIMATE_S
+        waiting = sum(self._depth.values()) + self._running
+        return max(1, math.ceil(run_s * waiting / max(self.workers, 1)))
+
+    def submit(self, question: str, lane: str = "interactive", callback_url: Optional[str] = None) -> Job:
+        """
+        Queue a question for the worker pool.
+
+        Args:
+            question: The user's question
+            lane: "interactive" or "batch"
+            callback_url: Optional URL the finished job is POSTed to
+
+        Returns:
+            The queued Job
+
+        Raises:
+            ValueError: If the lane is unknown
+            QueueFullError: If the lane is at its queue-depth limit
+        """
+        if self._queue is None:
+            raise RuntimeError("JobQueue.start() has not been called")
+        if lane not in self.lane_limits:
+            raise ValueError(f"Unknown lane '{lane}'")
+        if self._depth[lane] >= self.lane_limits[lane]:
+            self._counters["shed"] += 1
+            raise QueueFullError(lane, self.retry_after())
+
+        job = Job(id=uuid.uuid4().hex, question=question, lane=lane, callback_url=callback_url)
+        self._jobs[job.id] = job
+        self._depth[lane] += 1
+        self._counters["submitted"] += 1
+        self._queue.put_nowait((LANE_PRIORITY[lane], next(self._sequence), job.id))
+        self._evict()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def stats(self) -> Dict:
+        return {
+            **self._counters,
+            "workers": self.workers,
+            "running": self._running,
+            "overrunning": self._overrunning,
+            "queued": dict(self._depth),
+            "limits": dict(self.lane_limits),
+            "avg_run_s": round(self._avg_run_s, 4) if self._avg_run_s is not None else None,
+        }
+
+    def _evict(self) -> None:
+        """Drop the oldest finished jobs beyond the retention limit."""
+        excess = len(self._jobs) - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done][:max(excess, 0)]:
+            del self._jobs[job_id]
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self._jobs[job_id]
+            self._depth[job.lane] -= 1
+            self._running += 1
+            try:
+                pending = await self._execute(job)
+                if job.callback_url:
+                    await self._notify(job)
+                if pending is not None:
+                    await self._wait_overrun(job, pending)
+            except Exception as e:
+                # One bad job must never take a worker down with it
+                logger.error(f"Worker failed on job {job.id}: {str(e)}", exc_info=True)
+            finally:
+                self._running -= 1
+                self._queue.task_done()
+
+    async def _execute(self, job: Job) -> Optional[asyncio.Future]:
+        """Run a job; returns the still-running thread's future if it timed out."""
+        job.status = JobStatus.RUNNING
+        job.started_at = time.time()
+        run = asyncio.get_running_loop().run_in_executor(self._executor, self.runner, job.question)
+        try:
+            job.result = await asyncio.wait_for(asyncio.shield(run), timeout=self.timeout_s)
+            job.status = JobStatus.SUCCEEDED
+        except asyncio.TimeoutError:
+            job.status = JobStatus.TIMED_OUT
+            job.error = f"Job exceeded {self.timeout_s}s"
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}", exc_info=True)
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+        job.finished_at = time.time()
+        self._counters[job.status.value] += 1
+
+        run_s = job.finished_at - job.started_at
+        self._avg_run_s = run_s if self._avg_run_s is None else 0.8 * self._avg_run_s + 0.2 * run_s
+        logger.info(f"Job {job.id} {job.status.value}: {job.timings()}")
+
+        return None if run.done() else run
+
+    async def _wait_overrun(self, job: Job, run: asyncio.Future) -> None:
+        # The synchronous agent cannot be interrupted; hold this worker until it returns
+        self._overrunning += 1
+        try:
+            await asyncio.gather(run, return_exceptions=True)
+        finally:
+            self._overrunning -= 1
+        logger.info(f"Timed-out job {job.id} released its worker after {time.time() - job.started_at:.1f}s")
+
+    async def _notify(self, job: Job) -> None:
+        try:
+            async with httpx.AsyncClient(timeout=10.0) as client:
+                response = await client.post(job.callback_url, json=job.as_dict())
+            job.callback_status = str(response.status_code)
+        except Exception as e:
+            # Includes httpx.InvalidURL, which is not an HTTPError
+            logger.warning(f"Callback for job {job.id} failed: {str(e)}")
+            job.callback_status = type(e).__name__
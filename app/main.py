@@ -1,8 +1,16 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from typing import Literal, Optional
+from fastapi import Depends, FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from app.agent import run
-from tools.google_sheets import get_sheets_service
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field, HttpUrl, field_validator
+from app.agent import run, router, context_budget
+from app.context import load_tokenizer
+from app.jobs import JobQueue, QueueFullError
+from app.profiling import ProfilingMiddleware, profiler
+from configs.agent_config import JOB_CALLBACK_HOSTS
+from tools.google_sheets import get_sheets_service, sheets_flight
 import logging
 from dotenv import load_dotenv
 
@@ -13,7 +21,18 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Bounded worker pool for /api/jobs
+job_queue = JobQueue(run)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the tokenizer before serving so no request waits on its download
+    await run_in_threadpool(load_tokenizer)
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -22,26 +41,107 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Profile-Id"],
 )
 
+# Samples requests armed via /admin/profiling or sent with X-Profile
+app.add_middleware(ProfilingMiddleware)
+
 class ChatRequest(BaseModel):
     message: str
 
+class ChatResponse(BaseModel):
+    response: str
+
+class JobRequest(BaseModel):
+    message: str
+    lane: Literal["interactive", "batch"] = "interactive"
+    callback_url: Optional[HttpUrl] = None
+
+    @field_validator("callback_url")
+    @classmethod
+    def check_callback_host(cls, url: Optional[HttpUrl]) -> Optional[HttpUrl]:
+        # Only POST results to configured hosts, never to arbitrary internal addresses
+        if url is not None and (url.host or "").lower() not in JOB_CALLBACK_HOSTS:
+            raise ValueError(f"Callbacks to host '{url.host}' are not allowed")
+        return url
+
+class ProfilingRequest(BaseModel):
+    requests: int = Field(default=1, ge=0, le=1000)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not profiler.is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
 @app.get("/")
 async def root():
     return {"status": "ok", "message": "Finance Agent API is running"}
 
+@app.get("/api/metrics")
+async def metrics():
+    return {
+        "models": router.stats(),
+        "context": context_budget.stats(),
+        "sheets_fetches": sheets_flight.stats(),
+        "jobs": job_queue.stats(),
+    }
+
+# Typed return: FastAPI serialises the model straight to JSON bytes with Pydantic
 @app.post("/api/chat")
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest) -> ChatResponse:
     try:
         logger.info(f"Received chat request with message: {request.message}")
-        response = run(request.message)
+        # run() blocks on OpenAI and Sheets; keep it off the event loop so
+        # concurrent requests actually overlap
+        response = await run_in_threadpool(run, request.message)
         logger.info(f"Generated response: {response}")
-        return {"response": response}
+        return ChatResponse(response=response)
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/jobs", status_code=202)
+async def submit_job(request: JobRequest):
+    try:
+        callback_url = str(request.callback_url) if request.callback_url else None
+        job = job_queue.submit(request.message, lane=request.lane, callback_url=callback_url)
+    except QueueFullError as e:
+        logger.warning(str(e))
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after_s)},
+        )
+    logger.info(f"Queued job {job.id} on {job.lane} lane")
+    return {"job_id": job.id, "status": job.status.value, "status_url": f"/api/jobs/{job.id}"}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.as_dict()
+
+@app.post("/admin/profiling", dependencies=[Depends(require_admin)])
+async def arm_profiling(request: ProfilingRequest):
+    armed = profiler.arm(request.requests)
+    logger.info(f"Profiling armed for the next {armed} requests")
+    return {"armed": armed}
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    return {"armed": profiler.armed, "profiles": profiler.recent()}
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str, format: Literal["json", "folded"] = "json"):
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    if format == "folded":
+        # Feed to flamegraph.pl, inferno or speedscope
+        return PlainTextResponse(profile.folded())
+    return profile.summary()
+
 if __name__ == "__main__":
     import uvicorn
     logger.info("Starting Finance Agent API server...")
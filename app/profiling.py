@@ -0,0 +1,241 @@
+"""On-demand profiling of live requests.
+
+An admin arms the profiler for the next N requests (or sends X-Profile: 1
+with a valid admin token on a single request). For each profiled request a
+background thread samples the Python stacks of the threads working on it and
+phase() records wall-clock time spent in the agent loop phases (OpenAI calls,
+Sheets fetches, DataFrame normalisation, JSON encoding). Samples are exported
+in folded-stack format, which flamegraph.pl, speedscope and inferno read
+directly.
+
+phase() itself lives in tools/timing.py so the tools layer can mark its
+phases without depending on the app. When no request is being profiled it is
+a single ContextVar lookup, and no sampling thread runs.
+"""
+
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from tools.timing import PhaseTimer, activate, deactivate
+
+# How often the sampler captures stacks
+SAMPLE_INTERVAL_S = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")) / 1000
+
+# Number of finished profiles kept for retrieval
+PROFILE_RETENTION = 50
+
+# Deepest stack captured per sample
+MAX_STACK_DEPTH = 128
+
+
+class RequestProfile(PhaseTimer):
+    """Samples and phase timings collected for one request."""
+
+    def __init__(self, method: str, path: str):
+        super().__init__()
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.duration_s: Optional[float] = None
+        self.status_code: Optional[int] = None
+        self.samples: Counter = Counter()
+
+    @property
+    def active(self) -> bool:
+        return self.duration_s is None
+
+    def finish(self) -> None:
+        self.duration_s = time.perf_counter() - self._started
+
+    def folded(self) -> str:
+        """Samples as folded stacks ("frame;frame;frame count"), root first."""
+        with self._lock:
+            return "\n".join(f"{stack} {count}" for stack, count in sorted(self.samples.items()))
+
+    def summary(self) -> Dict:
+        with self._lock:
+            phases = {
+                name: {"calls": int(entry["calls"]), "wall_s": round(entry["wall_s"], 4)}
+                for name, entry in sorted(self.phases.items())
+            }
+            sample_count = sum(self.samples.values())
+        return {
+            "profile_id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "duration_s": round(self.duration_s, 4) if self.duration_s is not None else None,
+            "phases": phases,
+            "samples": sample_count,
+            "sample_interval_ms": SAMPLE_INTERVAL_S * 1000,
+        }
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _stack(frame) -> str:
+    names: List[str] = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Profiler:
+    """Decides which requests to profile, runs the sampler and keeps results."""
+
+    def __init__(self, interval_s: float = SAMPLE_INTERVAL_S, retention: int = PROFILE_RETENTION):
+        self.interval_s = interval_s
+        self.retention = retention
+        self._armed = 0
+        self._active: List[RequestProfile] = []
+        self._finished: "OrderedDict[str, RequestProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        """Profiling is only available when ADMIN_TOKEN is configured."""
+        return bool(os.getenv("ADMIN_TOKEN"))
+
+    @staticmethod
+    def is_admin(token: Optional[str]) -> bool:
+        """Check an admin token against ADMIN_TOKEN."""
+        expected = os.getenv("ADMIN_TOKEN")
+        return bool(expected) and token is not None and hmac.compare_digest(token, expected)
+
+    def arm(self, requests: int) -> int:
+        """Profile the next `requests` requests; 0 disarms."""
+        with self._lock:
+            self._armed = max(requests, 0)
+            return self._armed
+
+    @property
+    def armed(self) -> int:
+        return self._armed
+
+    def should_profile(self, header: Optional[str], admin_token: Optional[str]) -> bool:
+        """Claim a profiling slot for a request if armed or explicitly asked for."""
+        if header and self.is_admin(admin_token):
+            return True
+        if not self._armed:
+            return False
+        with self._lock:
+            if self._armed:
+                self._armed -= 1
+                return True
+        return False
+
+    @contextmanager
+    def profile(self, method: str, path: str) -> Iterator[RequestProfile]:
+        """
+        Profile the enclosed request.
+
+        Threads are sampled once they enter a phase(); the event loop thread is
+        shared by all requests, so it is not sampled.
+        """
+        profile = RequestProfile(method, path)
+        token = activate(profile)
+        with self._lock:
+            self._active.append(profile)
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = threading.Thread(target=self._sample, name="profiler-sampler", daemon=True)
+                self._sampler.start()
+        try:
+            yield profile
+        finally:
+            deactivate(token)
+            if profile.active:
+                profile.finish()
+            with self._lock:
+                self._active.remove(profile)
+                self._finished[profile.id] = profile
+                while len(self._finished) > self.retention:
+                    self._finished.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return self._finished.get(profile_id)
+
+    def recent(self) -> List[Dict]:
+        with self._lock:
+            profiles = list(self._finished.values())
+        return [profile.summary() for profile in reversed(profiles)]
+
+    def _sample(self) -> None:
+        sampler_ident = threading.get_ident()
+        while True:
+            with self._lock:
+                active = list(self._active)
+                if not active:
+                    self._sampler = None
+                    return
+            frames = sys._current_frames()
+            for profile in active:
+                for ident in list(profile.threads):
+                    frame = frames.get(ident)
+                    if frame is None or ident == sampler_ident:
+                        continue
+                    stack = f"{profile.threads[ident]};{_stack(frame)}"
+                    with profile._lock:
+                        profile.samples[stack] += 1
+            del frames
+            time.sleep(self.interval_s)
+
+
+# Process-wide profiler used by the FastAPI app
+profiler = Profiler()
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles armed requests and those sent with X-Profile.
+
+    Profiled responses carry an X-Profile-Id header; results are read from the
+    admin endpoints. Paths under excluded_prefix (the admin API itself) are
+    never profiled so polling for results does not use up armed slots.
+    """
+
+    def __init__(self, app: ASGIApp, profiler: Profiler = profiler, excluded_prefix: str = "/admin"):
+        self.app = app
+        self.profiler = profiler
+        self.excluded_prefix = excluded_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not self.profiler.enabled
+            or scope["path"].startswith(self.excluded_prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        header = headers.get(b"x-profile", b"").decode("latin-1")
+        admin_token = headers.get(b"x-admin-token", b"").decode("latin-1") or None
+        if not self.profiler.should_profile(header, admin_token):
+            await self.app(scope, receive, send)
+            return
+
+        with self.profiler.profile(scope.get("method", ""), scope["path"]) as profile:
+            async def send_with_profile_id(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    profile.status_code = message["status"]
+                    message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile.id.encode())]
+                await send(message)
+
+            await self.app(scope, receive, send_with_profile_id)
@@ -0,0 +1,131 @@
+"""Model tiering for the agent loop.
+
+Tool-selection rounds and simple lookups go to a fast, cheap model; answering
+rounds of multi-step analysis questions escalate to the large model.
+"""
+
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from configs.agent_config import (
+    COMPLEX_QUESTION_KEYWORDS,
+    DEFAULT_MODEL,
+    FAST_MODEL,
+    MODEL_PRICING,
+    ROUTING_POLICY,
+)
+
+FAST_TIER = "fast"
+LARGE_TIER = "large"
+
+_COMPLEX_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(word) for word in COMPLEX_QUESTION_KEYWORDS) + r")\b",
+    re.IGNORECASE,
+)
+
+
+def is_complex_question(question: str) -> bool:
+    """
+    Decide whether a question needs multi-step analysis.
+
+    Args:
+        question: The user's question
+
+    Returns:
+        True if the question mentions an analysis keyword or asks several things at once
+    """
+    if _COMPLEX_PATTERN.search(question):
+        return True
+    return question.count("?") > 1
+
+
+@dataclass
+class TierStats:
+    """Accumulated latency, token and cost figures for one model tier."""
+    calls: int = 0
+    latency_s: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "latency_s": round(self.latency_s, 4),
+            "avg_latency_s": round(self.latency_s / self.calls, 4) if self.calls else 0.0,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+        }
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimate the USD cost of a completion from MODEL_PRICING (0 for unknown models)."""
+    pricing = MODEL_PRICING.get(model)
+    if not pricing:
+        return 0.0
+    return (prompt_tokens * pricing["prompt"] + completion_tokens * pricing["completion"]) / 1_000_000
+
+
+class ModelRouter:
+    """Pick a model for each round of the agent loop and record per-tier stats."""
+
+    def __init__(
+        self,
+        policy: str = ROUTING_POLICY,
+        fast_model: str = FAST_MODEL,
+        large_model: str = DEFAULT_MODEL,
+    ):
+        if policy not in ("tiered", "fixed"):
+            raise ValueError(f"Unknown routing policy '{policy}'")
+        self.policy = policy
+        self.models = {FAST_TIER: fast_model, LARGE_TIER: large_model}
+        self._stats = {FAST_TIER: TierStats(), LARGE_TIER: TierStats()}
+        self._lock = threading.Lock()
+
+    def select_tier(self, question: str, round_index: int) -> str:
+        """
+        Select the tier for a round of the agent loop.
+
+        Round 0 only decides which ranges to fetch, so it always runs on the fast
+        tier. Later rounds answer from the fetched data and escalate to the large
+        tier for complex questions.
+
+        Args:
+            question: The user's question
+            round_index: Zero-based index of the round within the current run
+
+        Returns:
+            FAST_TIER or LARGE_TIER
+        """
+        if self.policy == "fixed":
+            return LARGE_TIER
+        if round_index == 0 or not is_complex_question(question):
+            return FAST_TIER
+        return LARGE_TIER
+
+    def model_for(self, tier: str) -> str:
+        return self.models[tier]
+
+    def record(self, tier: str, latency_s: float, usage: Optional[object] = None) -> None:
+        """Record the latency and token usage of one completion on a tier."""
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        cost = estimate_cost(self.models[tier], prompt_tokens, completion_tokens)
+        with self._lock:
+            stats = self._stats[tier]
+            stats.calls += 1
+            stats.latency_s += latency_s
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+            stats.cost_usd += cost
+
+    def stats(self) -> Dict[str, Dict]:
+        """Return a snapshot of the per-tier stats keyed by tier name."""
+        with self._lock:
+            return {
+                tier: {"model": self.models[tier], **stats.as_dict()}
+                for tier, stats in self._stats.items()
+            }
@@ -0,0 +1,3 @@
+"""
+Local load-testing tools: an OpenAI/Sheets stub server and a load generator.
+"""
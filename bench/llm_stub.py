@@ -0,0 +1,274 @@
+"""Local OpenAI-compatible stub server with a fake Google Sheets API.
+
+Point the agent at it to exercise app.main without paying OpenAI or hitting
+live Sheets:
+
+    python -m bench.llm_stub --port 8100 --latency-ms 800 --jitter-ms 200
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 \\
+    GOOGLE_SHEETS_API_ENDPOINT=http://127.0.0.1:8100 \\
+    python -m app.main
+
+Replies follow scripted transcripts. A transcript is a list of steps, one per
+agent round; the round is the number of assistant messages already in the
+conversation. A step either requests tool calls or returns final content:
+
+    [
+      {"match": "revenue", "steps": [
+        {"tool_calls": [{"name": "google_sheets_query",
+                         "arguments": {"a1_range": "Sheet1!A1:AF100"}}]},
+        {"content": "Total revenue was $1,234.56."}
+      ]}
+    ]
+
+The first transcript whose "match" regex is found in the user question wins;
+a transcript without "match" is the fallback.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Query, Request
+
+from tools.google_sheets import parse_a1_range
+
+DEFAULT_TRANSCRIPTS: List[Dict] = [
+    {
+        "steps": [
+            {"tool_calls": [{
+                "name": "google_sheets_query",
+                "arguments": {"a1_range": "Sheet1!A1:AF100"},
+            }]},
+            {"content": "Based on the spreadsheet, total revenue was $1,234,567.89."},
+        ],
+    },
+]
+
+MONTHS = ["Dec/24"] + [
+    f"{month}/25" for month in
+    ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+]
+
+SUB_AREAS = [
+    "Technology", "Product", "HR", "Marketing / Community", "Strategy",
+    "Finance", "Sales", "Operations", "Legal", "Non-tech",
+]
+
+
+def default_grid() -> List[List[str]]:
+    """
+    Build a grid shaped like the financial model in docs/spreadsheet_context.md.
+
+    Labels live in column C, month headers in row 6 (E = "Dec/24", F onwards
+    2025) and values from column E onwards. Values are deterministic.
+    """
+    rng = random.Random(42)
+    grid: List[List[str]] = [[] for _ in range(5)]
+    grid.append(["", "", "Financial Model", ""] + MONTHS)
+
+    def add_row(label: str, sign: int) -> None:
+        values = [f"{sign * rng.uniform(1_000, 50_000):,.2f}" for _ in MONTHS]
+        grid.append(["", "", label, ""] + values)
+
+    add_row("Revenue", 1)
+    add_row("SALES", 1)
+    for macro, micros in (
+        ("Cost of Goods Sold", ["SOFTWARE", "NON-TECH", "EMPLOYEE COMPENSATION", "AD-HOC COGS"]),
+        ("Expenses", ["SOFTWARE", "NON-TECH", "EMPLOYEE COMPENSATION", "HARDWARES", "TRAVEL & EVENTS"]),
+    ):
+        add_row(macro, -1)
+        for micro in micros:
+            add_row(micro, -1)
+            for area in SUB_AREAS:
+                add_row(area, -1)
+    add_row("Interest Income", 1)
+    add_row("NET INCOME", 1)
+    return grid
+
+
+def slice_grid(grid: List[List[str]], a1_range: str) -> List[List[str]]:
+    """Return the cells of an A1 range, trimmed the way the Sheets API trims them."""
+    _, (first_row, first_col, last_row, last_col) = parse_a1_range(a1_range)
+    first_row = first_row or 0
+    first_col = first_col or 0
+    last_row = len(grid) - 1 if last_row is None else last_row
+    rows = []
+    for row in grid[first_row:last_row + 1]:
+        end = len(row) if last_col is None else last_col + 1
+        cells = row[first_col:end]
+        while cells and cells[-1] == "":
+            cells.pop()
+        rows.append(cells)
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+
+@dataclass
+class StubConfig:
+    """Latency and content settings for the stub server."""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    sheets_latency_ms: float = 0.0
+    sheet_name: str = "Sheet1"
+    revision: int = 1
+    transcripts: List[Dict] = field(default_factory=lambda: list(DEFAULT_TRANSCRIPTS))
+    grid: List[List[str]] = field(default_factory=default_grid)
+
+    @classmethod
+    def from_files(
+        cls,
+        transcript_file: Optional[str] = None,
+        grid_file: Optional[str] = None,
+        **kwargs,
+    ) -> "StubConfig":
+        config = cls(**kwargs)
+        if transcript_file:
+            with open(transcript_file) as f:
+                config.transcripts = json.load(f)
+        if grid_file:
+            with open(grid_file) as f:
+                config.grid = json.load(f)
+        return config
+
+
+def _select_step(transcripts: List[Dict], messages: List[Dict]) -> Dict:
+    question = next(
+        (m.get("content") or "" for m in messages if m.get("role") == "user"), ""
+    )
+    round_index = sum(1 for m in messages if m.get("role") == "assistant")
+
+    transcript = None
+    for candidate in transcripts:
+        pattern = candidate.get("match")
+        if pattern is None or re.search(pattern, question, re.IGNORECASE):
+            transcript = candidate
+            break
+    if transcript is None:
+        raise HTTPException(status_code=400, detail=f"No transcript matches question '{question}'")
+
+    steps = transcript["steps"]
+    return steps[min(round_index, len(steps) - 1)]
+
+
+def _completion(model: str, step: Dict, prompt_chars: int) -> Dict:
+    message: Dict = {"role": "assistant", "content": step.get("content")}
+    finish_reason = "stop"
+    if step.get("tool_calls"):
+        message["tool_calls"] = [
+            {
+                "id": f"call_{uuid.uuid4().hex[:24]}",
+                "type": "function",
+                "function": {
+                    "name": call["name"],
+                    "arguments": json.dumps(call.get("arguments", {})),
+                },
+            }
+            for call in step["tool_calls"]
+        ]
+        finish_reason = "tool_calls"
+
+    prompt_tokens = prompt_chars // 4
+    completion_tokens = len(json.dumps(message)) // 4
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def create_app(config: Optional[StubConfig] = None) -> FastAPI:
+    """Create the stub FastAPI app."""
+    config = config or StubConfig()
+    stub = FastAPI(title="Finance Agent LLM/Sheets stub")
+
+    async def delay(base_ms: float, jitter_ms: float = 0.0) -> None:
+        total = base_ms + (random.uniform(-jitter_ms, jitter_ms) if jitter_ms else 0.0)
+        if total > 0:
+            await asyncio.sleep(total / 1000)
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        step = _select_step(config.transcripts, body.get("messages", []))
+        await delay(config.latency_ms, config.jitter_ms)
+        return _completion(body.get("model", "stub"), step, len(json.dumps(body.get("messages", []))))
+
+    @stub.get("/v4/spreadsheets/{spreadsheet_id}")
+    async def spreadsheet_get(spreadsheet_id: str):
+        await delay(config.sheets_latency_ms)
+        return {"sheets": [{"properties": {
+            "title": config.sheet_name,
+            "gridProperties": {
+                "rowCount": max(len(config.grid), 1),
+                "columnCount": max((len(row) for row in config.grid), default=1),
+            },
+        }}]}
+
+    @stub.get("/v4/spreadsheets/{spreadsheet_id}/values:batchGet")
+    async def values_batch_get(spreadsheet_id: str, ranges: List[str] = Query(...)):
+        await delay(config.sheets_latency_ms)
+        try:
+            value_ranges = [
+                {"range": a1_range, "majorDimension": "ROWS", "values": slice_grid(config.grid, a1_range)}
+                for a1_range in ranges
+            ]
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"spreadsheetId": spreadsheet_id, "valueRanges": value_ranges}
+
+    @stub.get("/drive/v3/files/{file_id}")
+    async def drive_file_get(file_id: str):
+        return {"version": str(config.revision)}
+
+    @stub.get("/v4/spreadsheets/{spreadsheet_id}/values/{a1_range:path}")
+    async def values_get(spreadsheet_id: str, a1_range: str):
+        await delay(config.sheets_latency_ms)
+        try:
+            values = slice_grid(config.grid, a1_range)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"range": a1_range, "majorDimension": "ROWS", "values": values}
+
+    return stub
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=float(os.getenv("STUB_LATENCY_MS", 0)))
+    parser.add_argument("--jitter-ms", type=float, default=float(os.getenv("STUB_JITTER_MS", 0)))
+    parser.add_argument("--sheets-latency-ms", type=float, default=float(os.getenv("STUB_SHEETS_LATENCY_MS", 0)))
+    parser.add_argument("--transcripts", help="JSON file with scripted transcripts")
+    parser.add_argument("--grid", help="JSON file with the sheet grid (list of rows)")
+    args = parser.parse_args()
+
+    config = StubConfig.from_files(
+        transcript_file=args.transcripts,
+        grid_file=args.grid,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        sheets_latency_ms=args.sheets_latency_ms,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Open-loop load generator for the Finance Agent API.
+
+Drives /api/chat at a fixed request rate and reports throughput, latency
+percentiles and error rates:
+
+    python -m bench.loadgen --url http://127.0.0.1:8000 --rps 20 --duration 30
+
+Requests are scheduled on a fixed clock regardless of how quickly earlier ones
+complete, so a saturated server shows up as rising latency and errors rather
+than as a silently lower offered load.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+
+DEFAULT_QUESTIONS = ["What was our total revenue last quarter?"]
+
+
+@dataclass
+class RequestResult:
+    """Outcome of a single request."""
+    latency_s: float
+    status: Optional[int]
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status is not None and self.status < 400
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of values (0.0 for an empty sequence)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+@dataclass
+class LoadReport:
+    """Aggregated results of a load run."""
+    target_rps: float
+    elapsed_s: float
+    results: List[RequestResult] = field(default_factory=list)
+
+    def summary(self) -> Dict:
+        latencies = [r.latency_s for r in self.results if r.ok]
+        sent = len(self.results)
+        errors = sum(1 for r in self.results if not r.ok)
+        outcomes = Counter(
+            str(r.status) if r.error is None else r.error for r in self.results
+        )
+        return {
+            "target_rps": self.target_rps,
+            "elapsed_s": round(self.elapsed_s, 3),
+            "sent": sent,
+            "succeeded": sent - errors,
+            "errors": errors,
+            "error_rate": round(errors / sent, 4) if sent else 0.0,
+            "throughput_rps": round((sent - errors) / self.elapsed_s, 3) if self.elapsed_s else 0.0,
+            "latency_s": {
+                "p50": round(percentile(latencies, 50), 4),
+                "p95": round(percentile(latencies, 95), 4),
+                "p99": round(percentile(latencies, 99), 4),
+                "max": round(max(latencies), 4) if latencies else 0.0,
+            },
+            "outcomes": dict(outcomes),
+        }
+
+
+async def _send(client: httpx.AsyncClient, path: str, question: str) -> RequestResult:
+    started = time.perf_counter()
+    try:
+        response = await client.post(path, json={"message": question})
+        return RequestResult(time.perf_counter() - started, response.status_code)
+    except httpx.HTTPError as e:
+        return RequestResult(time.perf_counter() - started, None, type(e).__name__)
+
+
+async def run_load(
+    url: str,
+    rps: float,
+    duration_s: float,
+    questions: Sequence[str] = DEFAULT_QUESTIONS,
+    path: str = "/api/chat",
+    timeout_s: float = 120.0,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> LoadReport:
+    """
+    Send requests at a fixed rate and collect their results.
+
+    Args:
+        url: Base URL of the API
+        rps: Target requests per second
+        duration_s: How long to keep sending requests
+        questions: Questions to cycle through
+        path: Endpoint to drive
+        timeout_s: Per-request timeout
+        transport: Optional httpx transport (e.g. an ASGITransport for in-process runs)
+
+    Returns:
+        LoadReport with one result per request sent
+    """
+    if rps <= 0:
+        raise ValueError("rps must be positive")
+    total = max(1, int(rps * duration_s))
+    interval = 1.0 / rps
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+
+    async with httpx.AsyncClient(
+        base_url=url, timeout=timeout_s, limits=limits, transport=transport
+    ) as client:
+        started = time.perf_counter()
+        tasks = []
+        for i in range(total):
+            delay = started + i * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(_send(client, path, questions[i % len(questions)])))
+        results = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    return LoadReport(target_rps=rps, elapsed_s=elapsed, results=list(results))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/api/chat")
+    parser.add_argument("--rps", type=float, default=5.0)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to send requests for")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--question", action="append", dest="questions",
+                        help="Question to send (repeatable; cycled in order)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load(
+        args.url, args.rps, args.duration,
+        questions=args.questions or DEFAULT_QUESTIONS,
+        path=args.path,
+        timeout_s=args.timeout,
+    ))
+    print(json.dumps(report.summary(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
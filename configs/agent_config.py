@@ -5,12 +5,77 @@ This module contains configuration settings used throughout the finance agent ap
 Constants:
     DEFAULT_MODEL (str): The default OpenAI model to use for agent operations.
         Currently set to "gpt-4-turbo-preview" which is OpenAI's latest GPT-4 model
-        optimized for real-time performance.
+        optimized for real-time performance. This is the "large" tier used for
+        multi-step analysis.
+
+    FAST_MODEL (str): The cheaper, lower-latency model used for tool-selection
+        rounds and simple lookups.
+
+    ROUTING_POLICY (str): How models are picked for each round of the agent loop.
+        "tiered" routes between FAST_MODEL and DEFAULT_MODEL based on the round
+        and the complexity of the question; "fixed" always uses DEFAULT_MODEL.
+        Can be overridden with the AGENT_ROUTING_POLICY environment variable.
+
+    COMPLEX_QUESTION_KEYWORDS (tuple): Words that mark a question as multi-step
+        analysis and escalate its answering rounds to the large model.
+
+    MODEL_PRICING (dict): USD price per 1M prompt/completion tokens, used to
+        estimate the cost of each tier.
+
+    CONTEXT_TOKEN_BUDGET (int): Hard limit on prompt tokens sent per round. When
+        the conversation exceeds it, the oldest tool results are replaced by
+        short summaries, then the latest results are truncated; a prompt that
+        still does not fit fails the request.
+
+    JOB_WORKERS (int): Number of agent runs the job queue executes concurrently.
+
+    JOB_QUEUE_LIMITS (dict): Maximum queued jobs per priority lane before new
+        submissions are shed with 429. Interactive jobs are always dequeued
+        before batch jobs.
+
+    JOB_TIMEOUT_S (float): Wall-clock limit for a single job run.
+
+    JOB_RETENTION (int): Number of finished jobs kept for polling.
+
+    JOB_CALLBACK_HOSTS (frozenset): Hosts that job callback URLs may point to,
+        from the comma-separated AGENT_JOB_CALLBACK_HOSTS environment variable.
+        Callbacks are rejected when it is empty, so the server never POSTs to
+        arbitrary (e.g. internal) addresses.
 
     MAX_ROWS (int): The maximum number of rows to process in a single operation.
         This limit helps prevent memory issues and ensures reasonable processing times
         when working with large datasets.
 """
 
-DEFAULT_MODEL = "gpt-4-turbo-preview"
-MAX_ROWS = 500 
\ No newline at end of file
+import os
+
+DEFAULT_MODEL = os.getenv("AGENT_LARGE_MODEL", "gpt-4-turbo-preview")
+FAST_MODEL = os.getenv("AGENT_FAST_MODEL", "gpt-4o-mini")
+ROUTING_POLICY = os.getenv("AGENT_ROUTING_POLICY", "tiered")
+
+COMPLEX_QUESTION_KEYWORDS = (
+    "compare", "comparison", "versus", "vs", "trend", "variance", "forecast",
+    "why", "explain", "analyse", "analyze", "analysis", "margin", "growth",
+    "burn", "runway", "projection", "breakdown", "over time", "change",
+)
+
+MODEL_PRICING = {
+    "gpt-4-turbo-preview": {"prompt": 10.00, "completion": 30.00},
+    "gpt-4o-mini": {"prompt": 0.15, "completion": 0.60},
+    "gpt-3.5-turbo": {"prompt": 0.50, "completion": 1.50},
+}
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("AGENT_CONTEXT_TOKEN_BUDGET", "16000"))
+
+JOB_WORKERS = int(os.getenv("AGENT_JOB_WORKERS", "4"))
+JOB_QUEUE_LIMITS = {
+    "interactive": int(os.getenv("AGENT_JOB_INTERACTIVE_LIMIT", "20")),
+    "batch": int(os.getenv("AGENT_JOB_BATCH_LIMIT", "100")),
+}
+JOB_TIMEOUT_S = float(os.getenv("AGENT_JOB_TIMEOUT_S", "120"))
+JOB_RETENTION = 1000
+JOB_CALLBACK_HOSTS = frozenset(
+    host.strip().lower() for host in os.getenv("AGENT_JOB_CALLBACK_HOSTS", "").split(",") if host.strip()
+)
+
+MAX_ROWS = 500
@@ -6,6 +6,7 @@ setup(
     packages=find_packages(),
     install_requires=[
         "pandas",
+        "orjson",
         "google-auth",
         "google-api-python-client",
         "python-dotenv",
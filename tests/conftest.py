@@ -1,38 +1,34 @@
 """Test configuration and fixtures."""
 
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from openai import OpenAI
+from bench.llm_stub import DEFAULT_TRANSCRIPTS, StubConfig, create_app
 from tools.google_sheets import SheetsQueryReturn, SheetsQueryParams
 
-@pytest.fixture
-def mock_openai(monkeypatch):
-    """Mock OpenAI client and its responses."""
-    with patch("app.agent.client") as mock_client:
-        # Mock agent creation
-        mock_agent = MagicMock()
-        mock_agent.id = "fake-agent-id"
-        mock_client.beta.agents.create.return_value = mock_agent
-
-        # Mock thread creation
-        mock_thread = MagicMock()
-        mock_thread.id = "fake-thread-id"
-        mock_client.beta.threads.create.return_value = mock_thread
+def _stub_openai_client(transcripts):
+    stub = create_app(StubConfig(transcripts=transcripts))
+    return OpenAI(
+        api_key="fake-api-key",
+        base_url="http://testserver/v1",
+        http_client=TestClient(stub),
+    )
 
-        # Mock run creation and status
-        mock_run = MagicMock()
-        mock_run.id = "fake-run-id"
-        mock_client.beta.threads.runs.create.return_value = mock_run
-        
-        # Mock run status
-        mock_run_status = MagicMock()
-        mock_run_status.status = "completed"
-        mock_client.beta.threads.runs.retrieve.return_value = mock_run_status
+@pytest.fixture
+def stub_openai_client():
+    """Factory for real OpenAI clients that talk to the in-process LLM stub."""
+    return _stub_openai_client
 
-        # Mock message response
-        mock_message = MagicMock()
-        mock_message.content = [MagicMock(text=MagicMock(value="Test response"))]
-        mock_client.beta.threads.messages.list.return_value = MagicMock(data=[mock_message])
+@pytest.fixture(autouse=True)
+def no_snapshot_history(monkeypatch):
+    """Keep tests from writing sheet snapshots unless they opt in with their own store."""
+    monkeypatch.setattr("tools.snapshot_store.SNAPSHOT_DIR", "")
 
+@pytest.fixture
+def mock_openai(monkeypatch, stub_openai_client):
+    """Mock OpenAI client with the stub server's default transcript."""
+    with patch("app.agent.client", stub_openai_client(DEFAULT_TRANSCRIPTS)) as mock_client:
         yield mock_client
 
 @pytest.fixture
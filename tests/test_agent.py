@@ -1,6 +1,6 @@
 import os
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import patch
 from app.agent import run
 from tools.google_sheets import SheetsQueryReturn
 
@@ -17,35 +17,32 @@ def mock_env_vars(monkeypatch):
     monkeypatch.setenv("OPENAI_API_KEY", "fake-api-key")
     monkeypatch.setenv("GOOGLE_SERVICE_ACCOUNT_INFO", "{}")
 
-@pytest.fixture
-def mock_openai_client():
-    """Mock OpenAI client and its responses."""
-    with patch("app.agent.client") as mock_client:
-        # Mock agent creation
-        mock_agent = MagicMock()
-        mock_agent.id = "fake-agent-id"
-        mock_client.beta.agents.create.return_value = mock_agent
-
-        # Mock thread creation
-        mock_thread = MagicMock()
-        mock_thread.id = "fake-thread-id"
-        mock_client.beta.threads.create.return_value = mock_thread
-
-        # Mock run creation and status
-        mock_run = MagicMock()
-        mock_run.id = "fake-run-id"
-        mock_client.beta.threads.runs.create.return_value = mock_run
-        
-        # Mock run status
-        mock_run_status = MagicMock()
-        mock_run_status.status = "completed"
-        mock_client.beta.threads.runs.retrieve.return_value = mock_run_status
-
-        # Mock message response
-        mock_message = MagicMock()
-        mock_message.content = [MagicMock(text=MagicMock(value="Test response"))]
-        mock_client.beta.threads.messages.list.return_value = MagicMock(data=[mock_message])
+# Scripted chat transcripts served by the LLM stub
+AGENT_TRANSCRIPTS = [
+    {
+        "match": "weather",
+        "steps": [
+            {"content": "Sorry, I cannot help with that. I can only answer finance questions about our budget and expenses."},
+        ],
+    },
+    {
+        "steps": [
+            {"tool_calls": [{
+                "name": "google_sheets_query",
+                "arguments": {
+                    "spreadsheet_id": "test-sheet",
+                    "sql_query": "SELECT SUM(amount) FROM transactions",
+                },
+            }]},
+            {"content": "The total is $425.75."},
+        ],
+    },
+]
 
+@pytest.fixture
+def mock_openai_client(stub_openai_client):
+    """Mock OpenAI client backed by the LLM stub and scripted transcripts."""
+    with patch("app.agent.client", stub_openai_client(AGENT_TRANSCRIPTS)) as mock_client:
         yield mock_client
 
 @pytest.fixture
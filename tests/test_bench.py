@@ -0,0 +1,69 @@
+"""Tests for the LLM stub server and load generator."""
+
+import asyncio
+import httpx
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from bench.llm_stub import StubConfig, create_app, default_grid, slice_grid
+from bench.loadgen import percentile, run_load
+
+def test_stub_follows_scripted_transcript():
+    """Test that the stub requests a tool call first and then answers."""
+    client = TestClient(create_app())
+    messages = [{"role": "user", "content": "Total revenue?"}]
+
+    first = client.post("/v1/chat/completions", json={"model": "m", "messages": messages}).json()
+    tool_call = first["choices"][0]["message"]["tool_calls"][0]
+    assert tool_call["function"]["name"] == "google_sheets_query"
+
+    messages.append({"role": "assistant", "content": None, "tool_calls": [tool_call]})
+    messages.append({"role": "tool", "tool_call_id": tool_call["id"], "content": "{}"})
+    second = client.post("/v1/chat/completions", json={"model": "m", "messages": messages}).json()
+    assert "$" in second["choices"][0]["message"]["content"]
+    assert second["usage"]["prompt_tokens"] > 0
+
+def test_stub_serves_sheet_ranges():
+    """Test that the fake values API slices and trims the grid like Sheets does."""
+    client = TestClient(create_app(StubConfig(grid=[["a", "b", ""], ["", "1", "2"], [], []])))
+
+    response = client.get("/v4/spreadsheets/abc/values/Sheet1!A1:C4").json()
+
+    assert response["values"] == [["a", "b"], ["", "1", "2"]]
+
+def test_default_grid_matches_documented_layout():
+    """Test that labels sit in column C and month headers in row 6."""
+    grid = default_grid()
+
+    assert slice_grid(grid, "Sheet1!C6:F6") == [["Financial Model", "", "Dec/24", "Jan/25"]]
+    assert slice_grid(grid, "Sheet1!C7")[0][0] == "Revenue"
+
+def test_percentile_nearest_rank():
+    """Test nearest-rank percentiles."""
+    values = [float(v) for v in range(1, 101)]
+
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 95) == 0.0
+
+def test_load_run_reports_throughput_and_errors():
+    """Test that the load generator counts successes, errors and latencies."""
+    api = FastAPI()
+    calls = []
+
+    @api.post("/api/chat")
+    async def chat(body: dict):
+        calls.append(body["message"])
+        if len(calls) % 2 == 0:
+            raise HTTPException(status_code=500, detail="boom")
+        return {"response": "ok"}
+
+    report = asyncio.run(run_load(
+        "http://test", rps=50, duration_s=0.2, transport=httpx.ASGITransport(app=api)
+    ))
+    summary = report.summary()
+
+    assert summary["sent"] == 10
+    assert summary["errors"] == 5
+    assert summary["error_rate"] == 0.5
+    assert summary["outcomes"] == {"200": 5, "500": 5}
+    assert summary["latency_s"]["p99"] >= summary["latency_s"]["p50"]
@@ -0,0 +1,124 @@
+"""Tests for token-aware context budgeting."""
+
+import json
+import logging
+import sys
+import pytest
+from app.context import (
+    ContextBudget,
+    ContextBudgetError,
+    count_tokens,
+    load_tokenizer,
+    message_tokens,
+    summarize_tool_result,
+)
+
+def _tool_result(rows):
+    """A tool message carrying a query result with the given number of rows."""
+    data = [{"label": f"Line {i}", "Jan/25": i * 1000.5} for i in range(rows)]
+    return {"role": "tool", "tool_call_id": f"call_{rows}", "content": json.dumps({"data": data, "columns": ["label", "Jan/25"]})}
+
+def _assistant():
+    return {"role": "assistant", "content": None, "tool_calls": [
+        {"id": "call", "type": "function", "function": {"name": "google_sheets_query", "arguments": "{}"}}
+    ]}
+
+def _conversation():
+    return [
+        {"role": "system", "content": "You answer finance questions."},
+        {"role": "user", "content": "Compare revenue and COGS"},
+        _assistant(), _tool_result(200),
+        _assistant(), _tool_result(150),
+    ]
+
+def test_missing_tokenizer_warns_and_estimates(monkeypatch, caplog):
+    """Test that falling back to the length estimate is logged as a warning."""
+    monkeypatch.setitem(sys.modules, "tiktoken", None)
+    load_tokenizer.cache_clear()
+    try:
+        with caplog.at_level(logging.WARNING, logger="app.context"):
+            assert count_tokens("x" * 40) == 10
+        assert "rough ~4 characters per token estimate" in caplog.text
+    finally:
+        load_tokenizer.cache_clear()
+
+def test_count_tokens_is_positive_and_monotonic():
+    """Test that longer text never counts as fewer tokens."""
+    assert count_tokens("") == 0
+    assert 0 < count_tokens("Revenue") <= count_tokens("Revenue for Jan/25 through Mar/25")
+    assert message_tokens({"role": "user", "content": "hi"}) > count_tokens("hi")
+
+def test_within_budget_leaves_messages_untouched():
+    """Test that nothing is evicted when the prompt fits."""
+    messages = _conversation()
+    before = json.dumps(messages)
+
+    tokens, evicted = ContextBudget(budget=10**6).fit(messages)
+
+    assert evicted == 0
+    assert tokens > 0
+    assert json.dumps(messages) == before
+
+def test_over_budget_evicts_oldest_tool_results_first():
+    """Test that the oldest result is summarised and the latest round is kept."""
+    messages = _conversation()
+    latest = messages[-1]["content"]
+    full, _ = ContextBudget(budget=10**6).fit(_conversation())
+
+    tokens, evicted = ContextBudget(budget=full - 100).fit(messages)
+
+    assert evicted == 1
+    assert tokens < full - 100
+    assert json.loads(messages[3]["content"])["evicted"] is True
+    assert json.loads(messages[3]["content"])["rows"] == 200
+    assert messages[-1]["content"] == latest
+    assert messages[0]["content"] == "You answer finance questions."
+
+def test_single_oversized_result_is_truncated_to_fit():
+    """Test that a latest-round result larger than the budget is cut to the rows that fit."""
+    messages = [
+        {"role": "system", "content": "You answer finance questions."},
+        {"role": "user", "content": "Show the whole model"},
+        _assistant(), _tool_result(2000),
+    ]
+
+    tokens, evicted = ContextBudget(budget=1500).fit(messages)
+
+    result = json.loads(messages[-1]["content"])
+    assert evicted == 1
+    assert tokens <= 1500
+    assert result["truncated"] is True
+    assert result["total_rows"] == 2000
+    assert 0 < len(result["data"]) < 2000
+    assert result["data"][0] == {"label": "Line 0", "Jan/25": 0.0}
+
+def test_prompt_that_cannot_fit_fails_the_request():
+    """Test that a budget below the fixed prompt raises instead of sending."""
+    messages = [
+        {"role": "system", "content": "You answer finance questions. " * 50},
+        {"role": "user", "content": "Revenue?"},
+    ]
+
+    with pytest.raises(ContextBudgetError):
+        ContextBudget(budget=50).fit(messages)
+
+def test_summary_keeps_shape_and_labels():
+    """Test that a summary records rows, columns and the first labels."""
+    summary = json.loads(summarize_tool_result(_tool_result(3)["content"]))
+
+    assert summary["rows"] == 3
+    assert summary["columns"] == ["label", "Jan/25"]
+    assert summary["labels"] == ["Line 0", "Line 1", "Line 2"]
+
+def test_record_accumulates_round_stats():
+    """Test that per-round token figures are aggregated."""
+    budget = ContextBudget(budget=100)
+
+    budget.record(0, 80, 0)
+    budget.record(1, 90, 2)
+    stats = budget.stats()
+
+    assert stats["rounds"] == 2
+    assert stats["evicted_tool_results"] == 2
+    assert stats["reduced_rounds"] == 1
+    assert stats["avg_prompt_tokens"] == 85.0
@@ -0,0 +1,166 @@
+"""Tests for the asynchronous job queue."""
+
+import asyncio
+import threading
+import time
+import pytest
+from app.jobs import JobQueue, JobStatus, QueueFullError
+
+async def _wait_done(queue, job, timeout=2.0):
+    """Poll a job until it finishes."""
+    deadline = time.monotonic() + timeout
+    while not job.done and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    return job
+
+def test_job_runs_and_records_timings():
+    """Test that a submitted job runs on the pool and records per-job timing."""
+    async def main():
+        queue = JobQueue(lambda question: f"answer to {question}", workers=1)
+        await queue.start()
+        job = queue.submit("Revenue?")
+        await _wait_done(queue, job)
+        await queue.stop()
+        return queue, job
+
+    queue, job = asyncio.run(main())
+
+    assert job.status == JobStatus.SUCCEEDED
+    assert job.result == "answer to Revenue?"
+    assert job.timings()["run_s"] is not None
+    assert queue.get(job.id) is job
+    assert queue.stats()["succeeded"] == 1
+
+def test_full_lane_is_shed_with_retry_after():
+    """Test that submissions beyond a lane's depth limit are rejected."""
+    release = threading.Event()
+
+    async def main():
+        queue = JobQueue(lambda question: release.wait(2) and "done", workers=1,
+                         lane_limits={"interactive": 1, "batch": 1})
+        await queue.start()
+        running = queue.submit("first")
+        while running.status != JobStatus.RUNNING:
+            await asyncio.sleep(0.01)
+        queue.submit("queued")
+        with pytest.raises(QueueFullError) as error:
+            queue.submit("shed")
+        # The batch lane has its own limit
+        queue.submit("batch job", lane="batch")
+        release.set()
+        await queue.stop()
+        return queue, error.value
+
+    queue, error = asyncio.run(main())
+
+    assert error.retry_after_s >= 1
+    assert queue.stats()["shed"] == 1
+
+def test_interactive_lane_runs_before_batch():
+    """Test that queued interactive jobs are dequeued ahead of batch jobs."""
+    order = []
+    release = threading.Event()
+
+    def runner(question):
+        if question == "blocker":
+            release.wait(2)
+        order.append(question)
+        return question
+
+    async def main():
+        queue = JobQueue(runner, workers=1)
+        await queue.start()
+        blocker = queue.submit("blocker")
+        while blocker.status != JobStatus.RUNNING:
+            await asyncio.sleep(0.01)
+        batch = queue.submit("batch", lane="batch")
+        interactive = queue.submit("interactive")
+        release.set()
+        await _wait_done(queue, batch)
+        await _wait_done(queue, interactive)
+        await queue.stop()
+
+    asyncio.run(main())
+
+    assert order == ["blocker", "interactive", "batch"]
+
+def test_slow_job_times_out_and_failures_are_recorded():
+    """Test that timeouts and runner errors end the job with an error."""
+    def runner(question):
+        if question == "slow":
+            time.sleep(0.3)
+            return "late"
+        raise RuntimeError("boom")
+
+    async def main():
+        queue = JobQueue(runner, workers=2, timeout_s=0.05)
+        await queue.start()
+        slow, broken = queue.submit("slow"), queue.submit("broken")
+        await _wait_done(queue, slow)
+        await _wait_done(queue, broken)
+        await queue.stop()
+        return slow, broken
+
+    slow, broken = asyncio.run(main())
+
+    assert slow.status == JobStatus.TIMED_OUT
+    assert broken.status == JobStatus.FAILED
+    assert broken.error == "boom"
+
+def test_bad_callback_url_does_not_kill_the_worker():
+    """Test that a malformed callback URL is recorded and the worker keeps serving jobs."""
+    async def main():
+        queue = JobQueue(lambda question: question, workers=1)
+        await queue.start()
+        bad = queue.submit("first", callback_url="http://[::1")
+        await _wait_done(queue, bad)
+        while bad.callback_status is None:
+            await asyncio.sleep(0.01)
+        later = queue.submit("second")
+        await _wait_done(queue, later)
+        await queue.stop()
+        return bad, later
+
+    bad, later = asyncio.run(main())
+
+    assert bad.callback_status == "InvalidURL"
+    assert later.status == JobStatus.SUCCEEDED
+
+def test_timed_out_run_keeps_its_worker_busy():
+    """Test that a timed-out run still occupies its worker until the thread returns."""
+    release = threading.Event()
+
+    def runner(question):
+        if question == "slow":
+            release.wait(2)
+        return question
+
+    async def main():
+        queue = JobQueue(runner, workers=1, timeout_s=0.05)
+        await queue.start()
+        slow = queue.submit("slow")
+        await _wait_done(queue, slow)
+        waiting = queue.submit("next")
+        await asyncio.sleep(0.1)
+        during = (waiting.status, queue.stats()["overrunning"])
+        release.set()
+        await _wait_done(queue, waiting)
+        await queue.stop()
+        return slow, waiting, during
+
+    slow, waiting, during = asyncio.run(main())
+
+    assert slow.status == JobStatus.TIMED_OUT
+    assert during == (JobStatus.QUEUED, 1)
+    assert waiting.status == JobStatus.SUCCEEDED
+
+def test_api_rejects_callbacks_to_unlisted_hosts(monkeypatch):
+    """Test that /api/jobs only accepts callback URLs on allowlisted hosts."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    monkeypatch.setattr("app.main.JOB_CALLBACK_HOSTS", frozenset({"hooks.example.com"}))
+    client = TestClient(app)
+
+    for url in ("http://169.254.169.254/latest", "http://a:badport/", "ftp://hooks.example.com/x"):
+        response = client.post("/api/jobs", json={"message": "Revenue?", "callback_url": url})
+        assert response.status_code == 422, url
@@ -0,0 +1,120 @@
+"""Tests for on-demand request profiling."""
+
+import contextvars
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.profiling import Profiler
+from tools.google_sheets import SingleFlight
+from tools.timing import PhaseTimer, activate, deactivate, phase, timed
+from tools.google_sheets import SheetsQueryReturn
+
+def _busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+def test_phase_is_a_noop_outside_a_profile():
+    """Test that phase() records nothing when the request is not profiled."""
+    profiler = Profiler()
+    with phase("openai"):
+        pass
+    assert profiler.recent() == []
+
+def test_profile_records_phases_and_folded_stacks():
+    """Test that phases are timed and worker thread stacks are sampled."""
+    profiler = Profiler(interval_s=0.001)
+
+    with profiler.profile("POST", "/api/chat") as profile:
+        def worker():
+            with phase("normalize"):
+                _busy_loop(0.05)
+
+        # Threads inherit the profile the same way run_in_threadpool does
+        thread = threading.Thread(target=contextvars.copy_context().run, args=(worker,))
+        thread.start()
+        thread.join()
+
+    summary = profiler.get(profile.id).summary()
+    assert summary["phases"]["normalize"]["calls"] == 1
+    assert summary["phases"]["normalize"]["wall_s"] >= 0.05
+    assert summary["samples"] > 0
+    folded = profile.folded().splitlines()
+    assert any("test_profiling.py:_busy_loop" in line for line in folded)
+    stack, count = folded[0].rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
+
+def test_single_flight_waiters_record_no_fetch_time():
+    """Test that a shared fetch is timed only by the caller that runs it."""
+    flight = SingleFlight()
+    started = threading.Event()
+    leader_timer, waiter_timer = PhaseTimer(), PhaseTimer()
+
+    def fetch():
+        started.set()
+        time.sleep(0.05)
+        return "values"
+
+    def call(timer):
+        token = activate(timer)
+        try:
+            return flight.do("key", timed("sheets_fetch", fetch))
+        finally:
+            deactivate(token)
+
+    leader = threading.Thread(target=call, args=(leader_timer,))
+    leader.start()
+    started.wait(1)
+    assert call(waiter_timer) == "values"
+    leader.join()
+
+    assert leader_timer.phases["sheets_fetch"]["calls"] == 1
+    assert "sheets_fetch" not in waiter_timer.phases
+
+def test_armed_requests_are_counted_down(monkeypatch):
+    """Test that arming profiles exactly N requests and X-Profile needs the admin token."""
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    profiler = Profiler()
+    profiler.arm(2)
+
+    assert [profiler.should_profile(None, None) for _ in range(3)] == [True, True, False]
+    assert not profiler.should_profile("1", "wrong")
+    assert profiler.should_profile("1", "secret")
+
+@pytest.fixture
+def api(monkeypatch, mock_openai):
+    """API client with an admin token and canned Sheets data."""
+    from app.main import app
+    from app.profiling import profiler
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(
+        "app.agent.google_sheets_query",
+        lambda params: SheetsQueryReturn(data=[{"Revenue": 100.0}], columns=["Revenue"]),
+    )
+    yield TestClient(app)
+    profiler.arm(0)
+
+def test_profiling_endpoints(api):
+    """Test arming over the admin API and reading the per-request breakdown."""
+    assert api.post("/admin/profiling", json={"requests": 1}).status_code == 403
+
+    admin = {"X-Admin-Token": "secret"}
+    assert api.post("/admin/profiling", json={"requests": 1}, headers=admin).json() == {"armed": 1}
+
+    profiled = api.post("/api/chat", json={"message": "Total revenue?"})
+    unprofiled = api.post("/api/chat", json={"message": "Total revenue?"})
+    assert profiled.status_code == 200
+    assert "x-profile-id" not in unprofiled.headers
+
+    profile_id = profiled.headers["x-profile-id"]
+    summary = api.get(f"/admin/profiles/{profile_id}", headers=admin).json()
+    assert summary["status_code"] == 200
+    assert {"agent", "openai", "json_encode"} <= set(summary["phases"])
+
+    folded = api.get(f"/admin/profiles/{profile_id}", params={"format": "folded"}, headers=admin)
+    assert folded.headers["content-type"].startswith("text/plain")
+
+    # A single request can opt in with the admin token
+    one_off = api.get("/", headers={"X-Profile": "1", **admin})
+    assert "x-profile-id" in one_off.headers
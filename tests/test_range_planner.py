@@ -0,0 +1,144 @@
+"""Tests for the metadata-driven range planner."""
+
+import pytest
+from unittest.mock import MagicMock
+from bench.llm_stub import default_grid, slice_grid
+from tools import range_planner
+from tools.timing import PhaseTimer, activate, deactivate
+from tools.range_planner import (
+    SheetsLookupParams,
+    build_sections,
+    google_sheets_lookup,
+    parse_month_header,
+    parse_period,
+    plan_ranges,
+)
+
+@pytest.fixture
+def fake_sheets_service(monkeypatch):
+    """Serve metadata and batchGet requests from the stub's financial model grid."""
+    grid = default_grid()
+    service = MagicMock()
+    spreadsheets = service.spreadsheets.return_value
+    spreadsheets.get.return_value.execute.return_value = {"sheets": [{"properties": {
+        "title": "Sheet1",
+        "gridProperties": {"rowCount": len(grid), "columnCount": max(len(row) for row in grid)},
+    }}]}
+
+    def batch_get(spreadsheetId, ranges):
+        request = MagicMock()
+        request.execute.return_value = {
+            "valueRanges": [{"range": r, "values": slice_grid(grid, r)} for r in ranges]
+        }
+        return request
+
+    spreadsheets.values.return_value.batchGet.side_effect = batch_get
+    monkeypatch.setattr(range_planner, "get_sheets_service", lambda: service)
+    monkeypatch.setattr(range_planner, "get_sheet_revision", lambda spreadsheet_id: "1")
+    monkeypatch.setattr(range_planner, "_metadata_cache", {})
+    return service
+
+def test_parse_month_header_formats():
+    """Test that the header formats used in the model are recognised."""
+    assert parse_month_header("Dec/24") == (2024, 12)
+    assert parse_month_header("2025-01-25") == (2025, 1)
+    assert parse_month_header("25/02/2025") == (2025, 2)
+    assert parse_month_header("Financial Model") is None
+
+def test_parse_period_ranges():
+    """Test month ranges, quarters and year inference."""
+    assert parse_period("Jan–Mar/25") == [(2025, 1), (2025, 2), (2025, 3)]
+    assert parse_period("Nov-Jan/25") == [(2024, 11), (2024, 12), (2025, 1)]
+    assert parse_period("Q2/25") == [(2025, 4), (2025, 5), (2025, 6)]
+    assert parse_period("Jan/25, Mar/25") == [(2025, 1), (2025, 3)]
+    with pytest.raises(ValueError):
+        parse_period("sometime")
+
+def test_plan_merges_contiguous_rows_and_months(fake_sheets_service):
+    """Test that one label and a quarter become a single minimal range."""
+    metadata = range_planner.get_sheet_metadata("sheet-id")
+
+    assert metadata.header_row == 5
+    plan = plan_ranges(metadata, ["Revenue"], "Jan–Mar/25")
+    assert plan.ranges == ["'Sheet1'!F7:H7"]
+
+    plan = plan_ranges(metadata, ["Revenue", "SALES"], "Dec/24, Feb/25")
+    assert plan.ranges == ["'Sheet1'!E7:E8", "'Sheet1'!G7:G8"]
+
+def test_metadata_is_read_once_per_revision(fake_sheets_service):
+    """Test that metadata is cached until the revision changes."""
+    range_planner.get_sheet_metadata("sheet-id")
+    range_planner.get_sheet_metadata("sheet-id")
+
+    assert fake_sheets_service.spreadsheets.return_value.get.call_count == 1
+
+def test_lookup_returns_only_requested_cells(fake_sheets_service):
+    """Test that a lookup returns the requested label and months as numbers."""
+    result = google_sheets_lookup(SheetsLookupParams(
+        spreadsheet_id="sheet-id", labels=["revenue"], period="Jan-Feb/25"
+    ))
+
+    assert result.columns == ["row", "label", "macro", "micro", "Jan/25", "Feb/25"]
+    assert len(result.data) == 1
+    assert result.data[0]["label"] == "Revenue"
+    assert isinstance(result.data[0]["Jan/25"], float)
+    assert result.notes == ["'revenue' has no exact match; matched ignoring case: Revenue (row 7)"]
+
+def test_lookup_places_repeated_labels_in_the_hierarchy(fake_sheets_service):
+    """Test that labels repeated under several lines carry their macro/micro and can be filtered."""
+    result = google_sheets_lookup(SheetsLookupParams(
+        spreadsheet_id="sheet-id", labels=["SOFTWARE"], period="Jan/25"
+    ))
+    assert [(r["row"], r["macro"], r["micro"]) for r in result.data] == [
+        (10, "Cost of Goods Sold", "SOFTWARE"),
+        (55, "Expenses", "SOFTWARE"),
+    ]
+    assert result.notes == []
+
+    result = google_sheets_lookup(SheetsLookupParams(
+        spreadsheet_id="sheet-id", labels=["Technology"], macro="COGS", micro="software"
+    ))
+    assert [(r["row"], r["macro"], r["micro"]) for r in result.data] == [(11, "Cost of Goods Sold", "SOFTWARE")]
+
+    with pytest.raises(range_planner.SheetsQueryError, match="not found under Revenue: SOFTWARE"):
+        google_sheets_lookup(SheetsLookupParams(spreadsheet_id="sheet-id", labels=["SOFTWARE"], macro="Revenue"))
+
+def test_short_macro_names_start_a_macro_block():
+    """Test that a macro row written as "COGS" is a macro, not a micro line under Revenue."""
+    sections = build_sections([(0, "Revenue"), (1, "SALES"), (2, "COGS"), (3, "SOFTWARE"), (4, "HR")])
+
+    assert sections[1] == ("Revenue", "SALES")
+    assert sections[2] == ("COGS", "")
+    assert sections[3] == ("COGS", "SOFTWARE")
+    assert sections[4] == ("COGS", "SOFTWARE")
+
+def test_substring_matches_are_reported(fake_sheets_service):
+    """Test that a label widened to a substring match says which rows it picked up."""
+    metadata = range_planner.get_sheet_metadata("sheet-id")
+    plan = plan_ranges(metadata, ["tech"], macro="Expenses", micro="SOFTWARE")
+
+    assert [text for _, text in plan.rows] == ["Technology", "Non-tech"]
+    assert plan.notes == [
+        "'tech' has no exact match; matched by substring: "
+        "Technology (Expenses > SOFTWARE, row 56), Non-tech (Expenses > SOFTWARE, row 65)"
+    ]
+
+def test_lookup_times_each_sheets_call_once(fake_sheets_service):
+    """Test that sheets_fetch counts one phase per API call, without nesting."""
+    timer = PhaseTimer()
+    token = activate(timer)
+    try:
+        params = SheetsLookupParams(spreadsheet_id="sheet-id", labels=["Revenue"])
+        google_sheets_lookup(params)
+        # Metadata is cached, so the second lookup makes a single batchGet
+        google_sheets_lookup(params)
+    finally:
+        deactivate(token)
+
+    assert timer.phases["sheets_fetch"]["calls"] == 2 + 2
+    assert timer.phases["normalize"]["calls"] == 2
+
+def test_lookup_reports_unknown_labels(fake_sheets_service):
+    """Test that unknown labels surface as a query error listing what exists."""
+    with pytest.raises(range_planner.SheetsQueryError, match="Labels not found: Ebitda"):
+        google_sheets_lookup(SheetsLookupParams(spreadsheet_id="sheet-id", labels=["Ebitda"]))
@@ -0,0 +1,47 @@
+"""Tests for model tier routing."""
+
+import pytest
+from types import SimpleNamespace
+from app.routing import ModelRouter, FAST_TIER, LARGE_TIER, is_complex_question
+
+def test_simple_lookup_stays_on_fast_tier():
+    """Test that simple lookups never escalate to the large model."""
+    router = ModelRouter(policy="tiered", fast_model="fast-model", large_model="large-model")
+
+    assert router.select_tier("What was revenue in Jan/25?", 0) == FAST_TIER
+    assert router.select_tier("What was revenue in Jan/25?", 1) == FAST_TIER
+
+def test_complex_question_escalates_after_tool_selection():
+    """Test that analysis questions use the large model once data has been fetched."""
+    router = ModelRouter(policy="tiered", fast_model="fast-model", large_model="large-model")
+    question = "Compare COGS versus Expenses growth over Q1"
+
+    assert is_complex_question(question)
+    assert router.select_tier(question, 0) == FAST_TIER
+    assert router.select_tier(question, 1) == LARGE_TIER
+    assert router.model_for(LARGE_TIER) == "large-model"
+
+def test_fixed_policy_always_uses_large_tier():
+    """Test that the fixed policy ignores question complexity."""
+    router = ModelRouter(policy="fixed")
+
+    assert router.select_tier("Revenue?", 0) == LARGE_TIER
+
+def test_unknown_policy_is_rejected():
+    """Test that a misconfigured policy fails loudly."""
+    with pytest.raises(ValueError):
+        ModelRouter(policy="random")
+
+def test_record_accumulates_latency_and_cost():
+    """Test that per-tier latency, tokens and cost are recorded."""
+    router = ModelRouter(policy="tiered", fast_model="gpt-4o-mini", large_model="gpt-4-turbo-preview")
+    usage = SimpleNamespace(prompt_tokens=1_000_000, completion_tokens=0)
+
+    router.record(FAST_TIER, 0.5, usage)
+    router.record(FAST_TIER, 1.5, usage)
+    stats = router.stats()
+
+    assert stats[FAST_TIER]["calls"] == 2
+    assert stats[FAST_TIER]["avg_latency_s"] == 1.0
+    assert stats[FAST_TIER]["cost_usd"] == pytest.approx(0.30)
+    assert stats[LARGE_TIER]["calls"] == 0
@@ -0,0 +1,77 @@
+"""Tests for sheet-level revision history and the diff tool."""
+
+import pytest
+from unittest.mock import MagicMock
+from bench.llm_stub import default_grid, slice_grid
+from tools import range_planner, sheet_history
+from tools.google_sheets import SheetsQueryError
+from tools.sheet_history import SheetsDiffParams, capture_snapshot, google_sheets_diff
+from tools.snapshot_store import SnapshotStore
+
+@pytest.fixture
+def sheet(monkeypatch, tmp_path):
+    """A stub financial model whose revision and cells tests can change."""
+    state = {"grid": default_grid(), "revision": "1"}
+    service = MagicMock()
+    spreadsheets = service.spreadsheets.return_value
+    spreadsheets.get.return_value.execute.side_effect = lambda: {"sheets": [{"properties": {
+        "title": "Sheet1",
+        "gridProperties": {"rowCount": len(state["grid"]), "columnCount": 32},
+    }}]}
+
+    def request(payload):
+        mock = MagicMock()
+        mock.execute.side_effect = payload
+        return mock
+
+    spreadsheets.values.return_value.batchGet.side_effect = lambda spreadsheetId, ranges: request(
+        lambda: {"valueRanges": [{"values": slice_grid(state["grid"], r)} for r in ranges]}
+    )
+    spreadsheets.values.return_value.get.side_effect = lambda spreadsheetId, range: request(
+        lambda: {"values": slice_grid(state["grid"], range)}
+    )
+    for module in (range_planner, sheet_history):
+        monkeypatch.setattr(module, "get_sheets_service", lambda: service)
+        monkeypatch.setattr(module, "get_sheet_revision", lambda spreadsheet_id: state["revision"])
+    monkeypatch.setattr(range_planner, "_metadata_cache", {})
+    monkeypatch.setattr(sheet_history, "_captured", {})
+    store = SnapshotStore(str(tmp_path))
+    monkeypatch.setattr(sheet_history, "get_snapshot_store", lambda: store)
+    state["store"] = store
+    return state
+
+def test_snapshot_covers_the_whole_tab_once_per_revision(sheet):
+    """Test that one snapshot of every labelled row is stored per revision."""
+    assert capture_snapshot("sheet-id") == "1"
+    assert capture_snapshot("sheet-id") == "1"
+
+    [info] = sheet["store"].list("sheet-id", "Sheet1")
+    df = sheet["store"].load("sheet-id", "Sheet1", "1")
+    # Revenue, SALES, both macros with their micro lines and sub-areas, Interest Income, NET INCOME
+    assert info.rows == len(df) == 2 + (1 + 4 * 11) + (1 + 5 * 11) + 2
+    assert list(df.columns[:3]) == ["row", "label", "Dec/24"]
+    assert info.positions["Dec/24"] == 4
+
+def test_diff_against_previous_revision_sliced_by_range(sheet):
+    """Test that diffs compare stored revisions and honour the requested range."""
+    capture_snapshot("sheet-id")
+    # Revenue is on sheet row 7; column F holds Jan/25
+    sheet["grid"][6][5] = "999,999.00"
+    sheet["grid"][7][6] = "1.00"
+    sheet["revision"] = "2"
+
+    result = google_sheets_diff(SheetsDiffParams(spreadsheet_id="sheet-id", base="previous"))
+    sliced = google_sheets_diff(SheetsDiffParams(
+        spreadsheet_id="sheet-id", base="previous", a1_range="Sheet1!A1:F7"
+    ))
+
+    assert (result.base["revision"], result.target["revision"]) == ("1", "2")
+    assert result.changed_cells == 2
+    assert sliced.changed_cells == 1
+    assert sliced.changes[0]["row"] == "Revenue" and sliced.changes[0]["column"] == "Jan/25"
+    assert sliced.changes[0]["after"] == 999999.0
+
+def test_diff_without_history_is_a_tool_error(sheet):
+    """Test that asking for a previous revision before one exists is reported clearly."""
+    with pytest.raises(SheetsQueryError, match="Only one revision"):
+        google_sheets_diff(SheetsDiffParams(spreadsheet_id="sheet-id", base="previous"))
@@ -1,7 +1,19 @@
 """Tests for Google Sheets functionality."""
 
+import asyncio
+import json
+import threading
+import time
+import pandas as pd
 import pytest
-from tools.google_sheets import SheetsQueryParams, SheetsQueryReturn
+from tools import google_sheets
+from tools.google_sheets import (
+    SheetsQueryError,
+    SheetsQueryParams,
+    SheetsQueryReturn,
+    SingleFlight,
+    VALIDATION_MAX_ROWS,
+)
 
 def test_sql_query_returns_columns(fake_sheets_query):
     """Test that SQL query returns expected columns."""
@@ -27,4 +39,116 @@ def test_a1_range_returns_data(fake_sheets_query):
     
     assert result.columns == ["SUM(amount)"]
     assert len(result.data) == 1
-    assert result.data[0]["SUM(amount)"] == 425.75 
\ No newline at end of file
+    assert result.data[0]["SUM(amount)"] == 425.75 
+
+def test_from_frame_matches_to_dict_records():
+    """Test that the fast record builder matches pandas' own records output."""
+    df = pd.DataFrame({"label": ["Revenue", "COGS"], "Jan/25": [100.5, -40.25]})
+
+    result = SheetsQueryReturn.from_frame(df)
+
+    assert result.columns == ["label", "Jan/25"]
+    assert result.data == df.to_dict("records")
+
+def test_large_frame_skips_validation_but_keeps_data():
+    """Test that large results are built without per-row validation."""
+    rows = VALIDATION_MAX_ROWS + 1
+    df = pd.DataFrame({"label": [f"row{i}" for i in range(rows)], "value": range(rows)})
+
+    result = SheetsQueryReturn.from_frame(df)
+
+    assert len(result.data) == rows
+    assert result.data[-1] == {"label": f"row{rows - 1}", "value": rows - 1}
+
+def test_to_json_bytes_emits_valid_json():
+    """Test that NaN cells serialise as null instead of invalid JSON."""
+    df = pd.DataFrame({"label": ["Revenue"], "Jan/25": [float("nan")]})
+
+    payload = json.loads(SheetsQueryReturn.from_frame(df).to_json_bytes())
+
+    assert payload == {"data": [{"label": "Revenue", "Jan/25": None}], "columns": ["label", "Jan/25"]}
+
+def _run_concurrently(flight, key, fn, callers):
+    """Start callers threads on the same key and return their results or errors."""
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(_call_or_error(flight, key, fn)))
+        for _ in range(callers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def _call_or_error(flight, key, fn):
+    try:
+        return flight.do(key, fn)
+    except Exception as e:
+        return e
+
+def test_single_flight_coalesces_concurrent_calls():
+    """Test that concurrent identical fetches execute once and share the result."""
+    flight = SingleFlight()
+    executions = []
+
+    def fetch():
+        executions.append(1)
+        time.sleep(0.1)
+        return "parsed"
+
+    results = _run_concurrently(flight, ("values", "sheet", "A1:B2", "7"), fetch, callers=10)
+
+    assert results == ["parsed"] * 10
+    assert len(executions) == 1
+    stats = flight.stats()
+    assert stats["executions"] == 1
+    assert stats["coalesced"] == 9
+    assert stats["in_flight"] == 0
+
+def test_single_flight_propagates_errors_to_all_waiters():
+    """Test that a failed fetch raises in every waiting caller."""
+    flight = SingleFlight()
+
+    def fetch():
+        time.sleep(0.1)
+        raise SheetsQueryError("quota exceeded")
+
+    results = _run_concurrently(flight, "key", fetch, callers=5)
+
+    assert all(isinstance(result, SheetsQueryError) for result in results)
+    assert flight.stats()["executions"] == 1
+
+def test_single_flight_async_path_shares_fetch():
+    """Test that async callers wait on one shared fetch."""
+    flight = SingleFlight()
+    executions = []
+
+    def fetch():
+        executions.append(1)
+        time.sleep(0.1)
+        return "parsed"
+
+    async def main():
+        return await asyncio.gather(*(flight.do_async("key", fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["parsed"] * 5
+    assert len(executions) == 1
+
+def test_google_sheets_query_does_not_cache_completed_fetches(monkeypatch):
+    """Test that sequential identical queries each fetch fresh data."""
+    calls = []
+    monkeypatch.setattr(google_sheets, "get_sheet_revision", lambda spreadsheet_id: "3")
+
+    def fetch(params):
+        calls.append(params.a1_range)
+        return SheetsQueryReturn(data=[], columns=[])
+
+    monkeypatch.setattr(google_sheets, "_fetch_query", fetch)
+    params = SheetsQueryParams(spreadsheet_id="sheet", a1_range="Sheet1!A1:B2")
+
+    google_sheets.google_sheets_query(params)
+    google_sheets.google_sheets_query(params)
+
+    # Completed fetches are not cached, only in-flight ones are shared
+    assert calls == ["Sheet1!A1:B2", "Sheet1!A1:B2"]
@@ -0,0 +1,130 @@
+"""Tests for the versioned snapshot store."""
+
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from tools.snapshot_store import SnapshotError, SnapshotStore, diff_frames
+
+SHEET = "sheet-id"
+TAB = "Sheet1"
+
+def _model(jan_revenue=100.0, feb_cogs=-40.0):
+    """A small frame shaped like google_sheets_query output for the model."""
+    return pd.DataFrame({
+        "Financial Model": ["Revenue", "Technology", "Technology"],
+        "Jan/25": [jan_revenue, -10.0, -20.0],
+        "Feb/25": [120.0, feb_cogs, ""],
+    })
+
+def _block_files(root):
+    return sum(len(files) for _, _, files in os.walk(os.path.join(root, "blocks")))
+
+def test_unchanged_columns_are_stored_once(tmp_path):
+    """Test that a new revision only writes the columns that changed."""
+    store = SnapshotStore(str(tmp_path))
+
+    store.save(SHEET, TAB, "1", _model())
+    blocks_after_first = _block_files(tmp_path)
+    store.save(SHEET, TAB, "2", _model(jan_revenue=150.0))
+
+    assert blocks_after_first == 3
+    assert _block_files(tmp_path) == 4
+    assert [info.revision for info in store.list(SHEET, TAB)] == ["1", "2"]
+    assert store.latest(SHEET, TAB) == "2"
+
+def test_numeric_columns_are_memory_mapped(tmp_path):
+    """Test that loaded numeric columns come back as floats from a memory map."""
+    store = SnapshotStore(str(tmp_path))
+    store.save(SHEET, TAB, "1", _model())
+
+    df = store.load(SHEET, TAB, "1")
+
+    values = df["Jan/25"].to_numpy()
+    assert isinstance(values, np.memmap) or isinstance(values.base, np.memmap)
+    assert df["Financial Model"].tolist() == ["Revenue", "Technology", "Technology"]
+    assert np.isnan(df["Feb/25"].iloc[2])
+
+def test_resolve_previous_dates_and_unknown(tmp_path):
+    """Test revision references by ID, 'previous' and date."""
+    store = SnapshotStore(str(tmp_path))
+    store.save(SHEET, TAB, "1", _model())
+    store.save(SHEET, TAB, "2", _model(jan_revenue=150.0))
+
+    assert store.resolve(SHEET, TAB, "previous") == "1"
+    assert store.resolve(SHEET, TAB, "latest") == "2"
+    assert store.resolve(SHEET, TAB, "2100-01-01") == "2"
+    with pytest.raises(SnapshotError):
+        store.resolve(SHEET, TAB, "2000-01-01")
+    with pytest.raises(SnapshotError):
+        store.resolve(SHEET, TAB, "nope")
+
+def test_content_revision_used_when_drive_version_unknown(tmp_path):
+    """Test that identical content without a revision is stored once."""
+    store = SnapshotStore(str(tmp_path))
+
+    first = store.save(SHEET, TAB, None, _model())
+    second = store.save(SHEET, TAB, None, _model())
+
+    assert first == second
+    assert first.startswith("sha-")
+    assert len(store.list(SHEET, TAB)) == 1
+
+def test_reverted_content_is_ordered_by_latest_history(tmp_path):
+    """Test that A -> B -> A makes A the latest revision and B the previous one."""
+    store = SnapshotStore(str(tmp_path))
+
+    first = store.save(SHEET, TAB, None, _model())
+    second = store.save(SHEET, TAB, None, _model(jan_revenue=150.0))
+    again = store.save(SHEET, TAB, None, _model())
+
+    assert again == first
+    assert store.resolve(SHEET, TAB, "latest") == first
+    assert store.resolve(SHEET, TAB, "previous") == second
+    assert [info.revision for info in store.list(SHEET, TAB)] == [second, first]
+
+def test_version_bump_without_tab_changes_adds_no_history(tmp_path):
+    """Test that a Drive version from an edit elsewhere in the file keeps 'previous' meaningful."""
+    store = SnapshotStore(str(tmp_path))
+
+    store.save(SHEET, TAB, "1", _model())
+    store.save(SHEET, TAB, "2", _model(jan_revenue=150.0))
+    stored = store.save(SHEET, TAB, "3", _model(jan_revenue=150.0))
+
+    assert stored == "2"
+    assert [revision for _, revision in store.history(SHEET, TAB)] == ["1", "2"]
+    assert store.resolve(SHEET, TAB, "previous") == "1"
+    changes = diff_frames(store.load(SHEET, TAB, "1"), store.load(SHEET, TAB, "2"))
+    assert changes["changed_cells"] == 1
+
+def test_retention_prunes_old_revisions_and_blocks(tmp_path):
+    """Test that history beyond the retention limit is deleted with its unshared blocks."""
+    store = SnapshotStore(str(tmp_path), retention=2)
+
+    for revision, revenue in enumerate((100.0, 200.0, 300.0), start=1):
+        store.save(SHEET, TAB, str(revision), _model(jan_revenue=revenue))
+
+    assert [info.revision for info in store.list(SHEET, TAB)] == ["2", "3"]
+    with pytest.raises(SnapshotError):
+        store.load(SHEET, TAB, "1")
+    # Three shared columns plus one Jan/25 block per retained revision
+    assert _block_files(tmp_path) == 4
+    assert store.load(SHEET, TAB, "2")["Jan/25"].iloc[0] == 200.0
+
+def test_diff_aligns_repeated_labels_and_reports_changes():
+    """Test the cell-level diff between two revisions."""
+    base = _model()
+    target = _model(jan_revenue=150.0, feb_cogs=-55.0)
+    target["Mar/25"] = [1.0, 2.0, 3.0]
+
+    result = diff_frames(base, target)
+
+    assert result["changed_cells"] == 2
+    assert result["changes"][0] == {
+        "row": "Revenue", "occurrence": 0, "column": "Jan/25",
+        "before": 100.0, "after": 150.0, "delta": 50.0, "pct_change": 50.0,
+    }
+    assert result["changes"][1]["row"] == "Technology"
+    assert result["changes"][1]["delta"] == -15.0
+    assert result["added_columns"] == ["Mar/25"]
+    assert result["added_rows"] == [] and result["removed_rows"] == []
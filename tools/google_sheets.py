@@ -1,11 +1,18 @@
 """Google Sheets tools for the finance agent."""
 
+import asyncio
 import json
 import os
-from functools import lru_cache
-from typing import Dict, List, Optional, Union
-
+import re
+import threading
+import time
+from concurrent.futures import Future
+from functools import partial, wraps
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+import orjson
 import pandas as pd
+from google.auth.credentials import AnonymousCredentials
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
@@ -13,10 +20,16 @@ from pandasql import sqldf
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
+from tools.timing import phase
+
 # Environment variables are loaded in app/main.py
 DEFAULT_SHEET_ID = os.getenv("GOOGLE_SHEET_ID")
 DEFAULT_SHEET_NAME = "Sheet1"
 
+# Results with more rows than this skip per-row pydantic validation; they are
+# built from an already-normalised DataFrame, so re-validating them is pure cost.
+VALIDATION_MAX_ROWS = 100
+
 # ────────────────────────────────────────────────────────────────────────────────
 # Custom Exceptions
 # ────────────────────────────────────────────────────────────────────────────────
@@ -56,6 +69,28 @@ class SheetsQueryParams(BaseModel):
 class SheetsQueryReturn(BaseModel):
     data: List[Dict] = Field(..., description="Rows returned")
     columns: List[str] = Field(..., description="Column names")
+    notes: List[str] = Field(default_factory=list, description="Caveats about how rows were matched")
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "SheetsQueryReturn":
+        """Build a result from a DataFrame, skipping validation for large frames."""
+        columns = [str(col) for col in df.columns]
+        data = frame_records(df)
+        if len(data) > VALIDATION_MAX_ROWS:
+            return cls.model_construct(data=data, columns=columns)
+        return cls(data=data, columns=columns)
+
+    def to_json_bytes(self) -> bytes:
+        """
+        Serialise to JSON bytes with orjson (NaN becomes null); notes only when present.
+
+        Rows are already plain Python values (see frame_records), so no NumPy
+        option is needed; orjson only saves the stdlib json encode.
+        """
+        payload = {"data": self.data, "columns": self.columns}
+        if self.notes:
+            payload["notes"] = self.notes
+        return orjson.dumps(payload)
 
 
 class SheetsAppendParams(BaseModel):
@@ -69,12 +104,123 @@ class SheetsAppendReturn(BaseModel):
     updated_rows: int = Field(..., description="Number of rows updated")
 
 
+# ────────────────────────────────────────────────────────────────────────────────
+# Serialisation helpers
+# ────────────────────────────────────────────────────────────────────────────────
+def frame_records(df: pd.DataFrame) -> List[Dict]:
+    """
+    Convert a DataFrame to a list of row dicts.
+
+    Equivalent to df.to_dict("records") but several times faster: each column
+    is converted from its NumPy buffer in one tolist() call and rows are
+    zipped together, instead of boxing every cell through pandas.
+    """
+    columns = [str(col) for col in df.columns]
+    values = [df.iloc[:, i].tolist() for i in range(len(columns))]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def coerce_numeric(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert numeric strings (with thousands separators) to float where possible."""
+    for col in df.columns:
+        try:
+            # Remove commas and spaces from numbers and convert
+            df[col] = df[col].str.strip().str.replace(',', '').astype(float, errors='ignore')
+        except:
+            pass
+    return df
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# A1 notation helpers
+# ────────────────────────────────────────────────────────────────────────────────
+_A1_CELL = re.compile(r"^\$?([A-Za-z]*)\$?(\d*)$")
+
+
+def column_index(letters: str) -> int:
+    """Convert column letters to a zero-based index ('A' -> 0, 'AF' -> 31)."""
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + (ord(char) - ord("A") + 1)
+    return index - 1
+
+
+def column_letter(index: int) -> str:
+    """Convert a zero-based column index to letters (0 -> 'A', 31 -> 'AF')."""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def parse_a1_range(a1_range: str) -> Tuple[Optional[str], Tuple[Optional[int], Optional[int], Optional[int], Optional[int]]]:
+    """
+    Split an A1 range into its sheet name and zero-based bounds.
+
+    Args:
+        a1_range: Range such as 'Sheet1!A1:AF200', 'C6:C90' or "'My tab'!B:B"
+
+    Returns:
+        Tuple of (sheet_name, (first_row, first_col, last_row, last_col)); open
+        bounds are None and sheet_name is None when the range has no sheet part
+
+    Raises:
+        ValueError: If the range is not valid A1 notation
+    """
+    sheet_name = None
+    cells = a1_range
+    if "!" in a1_range:
+        sheet_name, cells = a1_range.rsplit("!", 1)
+        sheet_name = sheet_name.strip("'")
+    start, _, end = cells.partition(":")
+    end = end or start
+
+    bounds = []
+    for cell in (start, end):
+        match = _A1_CELL.match(cell.strip())
+        if not match or not (match.group(1) or match.group(2)):
+            raise ValueError(f"Invalid A1 range '{a1_range}'")
+        letters, digits = match.groups()
+        bounds.append((
+            int(digits) - 1 if digits else None,
+            column_index(letters) if letters else None,
+        ))
+    (first_row, first_col), (last_row, last_col) = bounds
+    return sheet_name, (first_row, first_col, last_row, last_col)
+
+
 # ────────────────────────────────────────────────────────────────────────────────
 # Authentication
 # ────────────────────────────────────────────────────────────────────────────────
-@lru_cache()
+def thread_cached(fn: Callable[[], Any]) -> Callable[[], Any]:
+    """Cache a service factory per thread; httplib2 connections are not thread-safe."""
+    local = threading.local()
+
+    @wraps(fn)
+    def wrapper():
+        if not hasattr(local, "value"):
+            local.value = fn()
+        return local.value
+
+    return wrapper
+
+
+@thread_cached
 def get_sheets_service():
-    """Get authenticated Google Sheets service (cached)."""
+    """Get authenticated Google Sheets service (cached per thread).
+
+    When GOOGLE_SHEETS_API_ENDPOINT is set (e.g. to the local stub in
+    bench/llm_stub.py) requests go there unauthenticated instead of to Google.
+    """
+    endpoint = os.getenv("GOOGLE_SHEETS_API_ENDPOINT")
+    if endpoint:
+        return build(
+            "sheets", "v4",
+            credentials=AnonymousCredentials(),
+            client_options={"api_endpoint": endpoint},
+        )
     try:
         credentials = service_account.Credentials.from_service_account_file(
             os.getenv("GOOGLE_APPLICATION_CREDENTIALS"),
@@ -85,11 +231,170 @@ def get_sheets_service():
         raise SheetsAuthError(f"Failed to authenticate: {str(e)}")
 
 
+@thread_cached
+def get_drive_service():
+    """Get authenticated Google Drive service (cached per thread), used for file revisions."""
+    endpoint = os.getenv("GOOGLE_SHEETS_API_ENDPOINT")
+    if endpoint:
+        return build(
+            "drive", "v3",
+            credentials=AnonymousCredentials(),
+            client_options={"api_endpoint": endpoint.rstrip("/") + "/drive/v3/"},
+        )
+    try:
+        credentials = service_account.Credentials.from_service_account_file(
+            os.getenv("GOOGLE_APPLICATION_CREDENTIALS"),
+            scopes=["https://www.googleapis.com/auth/drive.metadata.readonly"],
+        )
+        return build("drive", "v3", credentials=credentials)
+    except Exception as e:
+        raise SheetsAuthError(f"Failed to authenticate: {str(e)}")
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Revisions
+# ────────────────────────────────────────────────────────────────────────────────
+# How long a looked-up revision is trusted before Drive is asked again
+REVISION_TTL_SECONDS = float(os.getenv("SHEETS_REVISION_TTL_SECONDS", "10"))
+
+_revision_cache: Dict[str, Tuple[float, Optional[str]]] = {}
+_revision_lock = threading.Lock()
+
+
+def get_sheet_revision(spreadsheet_id: str) -> Optional[str]:
+    """
+    Get the current revision of a spreadsheet.
+
+    Uses the Drive file "version", which increases on every edit. Lookups are
+    cached for REVISION_TTL_SECONDS so hot paths do not call Drive per request.
+
+    Args:
+        spreadsheet_id: Google Sheets file ID
+
+    Returns:
+        The revision as a string, or None when it cannot be determined (e.g.
+        the service account lacks Drive access); callers then fall back to
+        time-based expiry.
+    """
+    now = time.monotonic()
+    with _revision_lock:
+        cached = _revision_cache.get(spreadsheet_id)
+        if cached and now - cached[0] < REVISION_TTL_SECONDS:
+            return cached[1]
+
+    revision = sheets_flight.do(("revision", spreadsheet_id), partial(_fetch_revision, spreadsheet_id))
+
+    with _revision_lock:
+        _revision_cache[spreadsheet_id] = (now, revision)
+    return revision
+
+
+def _fetch_revision(spreadsheet_id: str) -> Optional[str]:
+    try:
+        with phase("sheets_fetch"):
+            result = get_drive_service().files().get(
+                fileId=spreadsheet_id, fields="version"
+            ).execute()
+        return str(result["version"]) if "version" in result else None
+    except Exception as e:
+        print(f"Could not determine revision of {spreadsheet_id}: {str(e)}")
+        return None
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Single-flight fetches
+# ────────────────────────────────────────────────────────────────────────────────
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into a single execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight wait for the same result (or exception). Nothing is cached once
+    the call completes, so later callers always trigger a fresh fetch. Shared
+    results must be treated as read-only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Tuple[Future, List[int]]] = {}
+        self._counters = {"calls": 0, "executions": 0, "coalesced": 0, "errors": 0, "max_waiters": 0}
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        with self._lock:
+            self._counters["calls"] += 1
+            if key in self._calls:
+                future, waiters = self._calls[key]
+                waiters[0] += 1
+                self._counters["coalesced"] += 1
+                self._counters["max_waiters"] = max(self._counters["max_waiters"], waiters[0])
+                return future, False
+            future = Future()
+            self._calls[key] = (future, [0])
+            self._counters["executions"] += 1
+            return future, True
+
+    def _finish(self, key: Hashable, future: Future, fn: Callable[[], Any]) -> None:
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                self._calls.pop(key, None)
+                self._counters["errors"] += 1
+            future.set_exception(e)
+        else:
+            with self._lock:
+                self._calls.pop(key, None)
+            future.set_result(result)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run fn for key, or wait for the call already in flight."""
+        future, leader = self._join(key)
+        if leader:
+            self._finish(key, future, fn)
+        return future.result()
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Async variant of do(); the blocking fn runs in a worker thread."""
+        future, leader = self._join(key)
+        if leader:
+            await asyncio.to_thread(self._finish, key, future, fn)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters plus the number of keys and waiters currently in flight."""
+        with self._lock:
+            return {
+                **self._counters,
+                "in_flight": len(self._calls),
+                "waiting": sum(waiters[0] for _, waiters in self._calls.values()),
+            }
+
+
+# Shared by every Sheets read so identical concurrent fetches hit Google once
+sheets_flight = SingleFlight()
+
+
 # ────────────────────────────────────────────────────────────────────────────────
 # Function Tools
 # ────────────────────────────────────────────────────────────────────────────────
 def google_sheets_query(params: SheetsQueryParams) -> SheetsQueryReturn:
-    """Query Google Sheets data using either A1 notation or SQL-like syntax."""
+    """Query Google Sheets data using either A1 notation or SQL-like syntax.
+
+    Concurrent calls for the same (spreadsheet, range, revision) share one fetch.
+    """
+    revision = get_sheet_revision(params.spreadsheet_id)
+    key = ("values", params.spreadsheet_id, params.a1_range, revision)
+    return sheets_flight.do(key, partial(_fetch_query, params))
+
+
+async def google_sheets_query_async(params: SheetsQueryParams) -> SheetsQueryReturn:
+    """Async variant of google_sheets_query sharing the same in-flight fetches."""
+    revision = await asyncio.to_thread(get_sheet_revision, params.spreadsheet_id)
+    key = ("values", params.spreadsheet_id, params.a1_range, revision)
+    return await sheets_flight.do_async(key, partial(_fetch_query, params))
+
+
+def _fetch_query(params: SheetsQueryParams) -> SheetsQueryReturn:
     try:
         service = get_sheets_service()
         spreadsheet = service.spreadsheets()
@@ -99,10 +404,11 @@ def google_sheets_query(params: SheetsQueryParams) -> SheetsQueryReturn:
         print(f"Range: {params.a1_range}")
 
         # Direct A1 range query
-        result = spreadsheet.values().get(
-            spreadsheetId=params.spreadsheet_id,
-            range=params.a1_range
-        ).execute()
+        with phase("sheets_fetch"):
+            result = spreadsheet.values().get(
+                spreadsheetId=params.spreadsheet_id,
+                range=params.a1_range
+            ).execute()
 
         # Log the raw API response
         print(f"API Response: {result}")
@@ -153,20 +459,9 @@ def google_sheets_query(params: SheetsQueryParams) -> SheetsQueryReturn:
                 padded_row.extend([''] * (len(unique_headers) - len(padded_row)))
             clean_data.append(padded_row)
 
-        df = pd.DataFrame(clean_data, columns=unique_headers)
-        
-        # Convert numeric strings to float where possible
-        for col in df.columns:
-            try:
-                # Remove commas and spaces from numbers and convert
-                df[col] = df[col].str.strip().str.replace(',', '').astype(float, errors='ignore')
-            except:
-                pass
-
-        return SheetsQueryReturn(
-            data=df.to_dict("records"),
-            columns=df.columns.tolist()
-        )
+        with phase("normalize"):
+            df = coerce_numeric(pd.DataFrame(clean_data, columns=unique_headers))
+            return SheetsQueryReturn.from_frame(df)
 
     except HttpError as e:
         raise SheetsQueryError(f"Google Sheets API error: {str(e)}")
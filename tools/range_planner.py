@@ -0,0 +1,580 @@
+"""Metadata-driven range planning for the Google Sheets tools.
+
+Instead of downloading the whole grid for every question, the planner reads
+the sheet layout once per revision (grid size, tab names, header row and the
+label column described in docs/spreadsheet_context.md) and turns a request
+such as "Revenue, Jan–Mar/25" into the minimal set of A1 ranges.
+
+Every labelled row is also placed in the macro/micro hierarchy of the model,
+so labels that repeat under several lines (SOFTWARE under both COGS and
+Expenses, the sub-areas under every micro line) can be told apart.
+"""
+
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from googleapiclient.errors import HttpError
+from pydantic import BaseModel, Field
+
+from tools.timing import phase, timed
+from tools.google_sheets import (
+    DEFAULT_SHEET_ID,
+    DEFAULT_SHEET_NAME,
+    SheetsQueryError,
+    SheetsQueryReturn,
+    coerce_numeric,
+    column_index,
+    column_letter,
+    get_sheet_revision,
+    get_sheets_service,
+    sheets_flight,
+)
+
+# Labels live in column C; month headers are searched for in the first rows
+LABEL_COLUMN = os.getenv("SHEETS_LABEL_COLUMN", "C")
+HEADER_SCAN_ROWS = 10
+
+# Top-level P&L lines (normalised); other ALL CAPS labels are micro lines
+MACRO_LINES = {
+    "revenue", "cost of goods sold", "cost of goods sold (cogs)", "expenses",
+    "interest income", "net income",
+}
+# Functional sub-areas as written in the model; "HR" is ALL CAPS but not a micro line
+SUB_AREAS = {
+    "Technology", "Product", "HR", "Marketing / Community", "Strategy",
+    "Finance", "Sales", "Operations", "Legal", "Non-tech",
+}
+# Short names accepted when filtering by macro line
+MACRO_ALIASES = {"cogs": "cost of goods sold", "cost of goods sold (cogs)": "cost of goods sold", "opex": "expenses"}
+
+# Metadata of sheets whose revision cannot be determined expires after this long
+METADATA_TTL_SECONDS = 300
+
+MONTHS = {
+    "jan": 1, "january": 1, "janeiro": 1,
+    "feb": 2, "february": 2, "fev": 2, "fevereiro": 2,
+    "mar": 3, "march": 3, "marco": 3, "março": 3,
+    "apr": 4, "april": 4, "abr": 4, "abril": 4,
+    "may": 5, "mai": 5, "maio": 5,
+    "jun": 6, "june": 6, "junho": 6,
+    "jul": 7, "july": 7, "julho": 7,
+    "aug": 8, "august": 8, "ago": 8, "agosto": 8,
+    "sep": 9, "sept": 9, "september": 9, "set": 9, "setembro": 9,
+    "oct": 10, "october": 10, "out": 10, "outubro": 10,
+    "nov": 11, "november": 11, "novembro": 11,
+    "dec": 12, "december": 12, "dez": 12, "dezembro": 12,
+}
+
+Month = Tuple[Optional[int], int]
+
+_NAMED_MONTH = re.compile(r"^([^\W\d_]+)\.?[\s/'\-]*(\d{4}|\d{2})$")
+_ISO_DATE = re.compile(r"^(\d{4})-(\d{1,2})(?:-\d{1,2})?(?:[ T].*)?$")
+_SLASH_DATE = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4}|\d{2})$")
+_MONTH_YEAR = re.compile(r"^(\d{1,2})/(\d{4})$")
+
+_PERIOD_MONTH = re.compile(r"([^\W\d_]{3,})\.?(?:[\s/']*-?[\s/']*(\d{4}|\d{2})(?!\d))?")
+_QUARTER = re.compile(r"^q([1-4])(?:[\s/'\-]*(\d{4}|\d{2}))?$")
+_YEAR = re.compile(r"^(?:fy)?\s*(\d{4}|\d{2})$")
+
+
+def _full_year(year: str) -> int:
+    value = int(year)
+    return value + 2000 if value < 100 else value
+
+
+def parse_month_header(cell: str) -> Optional[Tuple[int, int]]:
+    """
+    Parse a month column header into (year, month).
+
+    Accepts "Dec/24", "Jan-25", "January 2025", "2025-01-25", "1/25/2025",
+    "25/01/2025" and "01/2025".
+
+    Returns:
+        (year, month) or None if the cell is not a month header
+    """
+    text = str(cell).strip().lower()
+    if not text:
+        return None
+
+    match = _NAMED_MONTH.match(text)
+    if match:
+        month = MONTHS.get(match.group(1))
+        return (_full_year(match.group(2)), month) if month else None
+
+    match = _ISO_DATE.match(text)
+    if match:
+        year, month = int(match.group(1)), int(match.group(2))
+        return (year, month) if 1 <= month <= 12 else None
+
+    match = _SLASH_DATE.match(text)
+    if match:
+        first, second = int(match.group(1)), int(match.group(2))
+        month = second if first > 12 else first
+        return (_full_year(match.group(3)), month) if 1 <= month <= 12 else None
+
+    match = _MONTH_YEAR.match(text)
+    if match:
+        month = int(match.group(1))
+        return (int(match.group(2)), month) if 1 <= month <= 12 else None
+
+    return None
+
+
+def _month_span(start: Month, end: Month) -> List[Month]:
+    (start_year, start_month), (end_year, end_month) = start, end
+    if start_year is None or end_year is None:
+        if start_month > end_month:
+            raise ValueError("A range that wraps into the next year needs explicit years")
+        return [(start_year, month) for month in range(start_month, end_month + 1)]
+
+    months = []
+    year, month = start_year, start_month
+    while (year, month) <= (end_year, end_month):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    if not months:
+        raise ValueError("Period ends before it starts")
+    return months
+
+
+def _parse_period_part(part: str) -> List[Month]:
+    match = _QUARTER.match(part)
+    if match:
+        first = (int(match.group(1)) - 1) * 3 + 1
+        year = _full_year(match.group(2)) if match.group(2) else None
+        return [(year, month) for month in range(first, first + 3)]
+
+    match = _YEAR.match(part)
+    if match:
+        year = _full_year(match.group(1))
+        return [(year, month) for month in range(1, 13)]
+
+    tokens = []
+    for match in _PERIOD_MONTH.finditer(part):
+        month = MONTHS.get(match.group(1))
+        if month is None:
+            raise ValueError(f"Unknown month '{match.group(1)}'")
+        year = _full_year(match.group(2)) if match.group(2) else None
+        tokens.append([year, month])
+    if not tokens or len(tokens) > 2:
+        raise ValueError(f"Could not parse period '{part}'")
+
+    # "Jan-Mar/25": months without a year take the year of the next month that has one
+    if len(tokens) == 2:
+        start, end = tokens
+        if start[0] is None and end[0] is not None:
+            start[0] = end[0] - 1 if start[1] > end[1] else end[0]
+        elif end[0] is None and start[0] is not None:
+            end[0] = start[0] + 1 if end[1] < start[1] else start[0]
+        return _month_span(tuple(start), tuple(end))
+    return [tuple(tokens[0])]
+
+
+def parse_period(text: str) -> List[Month]:
+    """
+    Parse a period such as "Jan–Mar/25", "Dec/24-Feb/25", "Q1/25", "2025" or
+    "Jan/25, Mar/25" into a list of (year, month) tuples.
+
+    The year is None when the period does not mention one; the planner then
+    uses the most recent matching month in the sheet.
+
+    Raises:
+        ValueError: If the period cannot be parsed
+    """
+    normalized = (
+        text.lower()
+        .replace("–", "-").replace("—", "-").replace("‑", "-")
+        .replace(" to ", "-").replace(" through ", "-").replace(" until ", "-")
+    )
+    months: List[Month] = []
+    for part in normalized.split(","):
+        part = part.strip()
+        if part:
+            months.extend(m for m in _parse_period_part(part) if m not in months)
+    if not months:
+        raise ValueError(f"Could not parse period '{text}'")
+    return months
+
+
+def _normalize_label(label: str) -> str:
+    text = str(label).replace("‑", "-").replace("–", "-").replace(" ", " ")
+    return " ".join(text.split()).lower()
+
+
+def _macro_key(label: str) -> str:
+    normalized = _normalize_label(label)
+    return MACRO_ALIASES.get(normalized, normalized)
+
+
+def build_sections(labels: List[Tuple[int, str]]) -> Dict[int, Tuple[str, str]]:
+    """
+    Place each labelled row under its macro and micro line.
+
+    Follows the parsing rules in docs/spreadsheet_context.md: a known macro
+    label starts a new macro, any other ALL CAPS label is a micro line inside
+    it, and everything else (including the known sub-areas, such as "HR") is
+    a sub-area of the last micro line.
+
+    Returns:
+        Mapping of row index to (macro, micro); empty strings where a row has
+        no such parent (a macro row has no micro)
+    """
+    sections: Dict[int, Tuple[str, str]] = {}
+    macro = micro = ""
+    for row, text in labels:
+        if _macro_key(text) in MACRO_LINES:
+            macro, micro = text, ""
+        elif text.isupper() and text not in SUB_AREAS:
+            micro = text
+        sections[row] = (macro, micro)
+    return sections
+
+
+def quote_sheet(sheet_name: str) -> str:
+    return "'" + sheet_name.replace("'", "''") + "'"
+
+
+def _spans(indices: List[int]) -> List[Tuple[int, int]]:
+    """Group sorted indices into inclusive (first, last) runs of consecutive values."""
+    spans: List[Tuple[int, int]] = []
+    for index in indices:
+        if spans and index == spans[-1][1] + 1:
+            spans[-1] = (spans[-1][0], index)
+        else:
+            spans.append((index, index))
+    return spans
+
+
+@dataclass
+class SheetMetadata:
+    """Layout of one tab, read once per spreadsheet revision."""
+    sheet_name: str
+    row_count: int
+    column_count: int
+    tab_names: List[str]
+    label_column: int
+    header_row: Optional[int]
+    headers: Dict[int, str] = field(default_factory=dict)
+    months: Dict[Tuple[int, int], int] = field(default_factory=dict)
+    labels: List[Tuple[int, str]] = field(default_factory=list)
+    sections: Dict[int, Tuple[str, str]] = field(default_factory=dict)
+
+    def find_rows(self, label: str) -> Tuple[List[Tuple[int, str]], str]:
+        """
+        Rows whose label matches, preferring exact case, then any case, then substring.
+
+        Case is tried first because it carries meaning in the model: "SALES" is
+        a micro line while "Sales" is a sub-area.
+
+        Returns:
+            Tuple of (matching rows, how they matched: "exact", "case" or "substring")
+        """
+        stripped = " ".join(label.split())
+        exact = [(row, text) for row, text in self.labels if text == stripped]
+        if exact:
+            return exact, "exact"
+        wanted = _normalize_label(label)
+        same = [(row, text) for row, text in self.labels if _normalize_label(text) == wanted]
+        if same:
+            return same, "case"
+        return [(row, text) for row, text in self.labels if wanted in _normalize_label(text)], "substring"
+
+    def section(self, row: int) -> Tuple[str, str]:
+        """(macro, micro) a row sits under; see build_sections()."""
+        return self.sections.get(row, ("", ""))
+
+    def in_section(self, row: int, macro: Optional[str] = None, micro: Optional[str] = None) -> bool:
+        """Whether a row sits under the given macro and/or micro line (any case)."""
+        row_macro, row_micro = self.section(row)
+        if macro and _macro_key(row_macro) != _macro_key(macro):
+            return False
+        if micro and _normalize_label(row_micro) != _normalize_label(micro):
+            return False
+        return True
+
+    def describe_row(self, row: int, text: str) -> str:
+        """Label with its place in the hierarchy, e.g. "Technology (Expenses > SOFTWARE, row 58)"."""
+        path = " > ".join(part for part in self.section(row) if part and part != text)
+        return f"{text} ({path + ', ' if path else ''}row {row + 1})"
+
+    def find_columns(self, months: List[Month]) -> List[int]:
+        """Month columns for the requested months; year-less months use the latest match."""
+        columns = []
+        for year, month in months:
+            if year is not None:
+                column = self.months.get((year, month))
+            else:
+                candidates = [key for key in self.months if key[1] == month]
+                column = self.months[max(candidates)] if candidates else None
+            if column is None:
+                raise ValueError(
+                    f"Month {month:02d}/{year or '*'} not found in header row; "
+                    f"available: {', '.join(self.headers[c] for c in sorted(self.months.values()))}"
+                )
+            if column not in columns:
+                columns.append(column)
+        return sorted(columns)
+
+
+@dataclass
+class RangePlan:
+    """Minimal A1 ranges covering the requested label rows and month columns."""
+    ranges: List[str]
+    row_spans: List[Tuple[int, int]]
+    column_spans: List[Tuple[int, int]]
+    rows: List[Tuple[int, str]]
+    columns: List[int]
+    notes: List[str] = field(default_factory=list)
+
+
+def load_sheet_metadata(spreadsheet_id: str, sheet_name: str = DEFAULT_SHEET_NAME) -> SheetMetadata:
+    """Read grid size, tab names, label column and header row of a tab."""
+    spreadsheet = get_sheets_service().spreadsheets()
+    with phase("sheets_fetch"):
+        info = spreadsheet.get(
+            spreadsheetId=spreadsheet_id,
+            fields="sheets.properties(title,gridProperties(rowCount,columnCount))",
+        ).execute()
+
+    tabs = {
+        sheet["properties"]["title"]: sheet["properties"].get("gridProperties", {})
+        for sheet in info.get("sheets", [])
+    }
+    if sheet_name not in tabs:
+        raise SheetsQueryError(f"Tab '{sheet_name}' not found; available tabs: {', '.join(tabs)}")
+    row_count = int(tabs[sheet_name].get("rowCount", 1000))
+    column_count = int(tabs[sheet_name].get("columnCount", 26))
+
+    label_column = column_index(LABEL_COLUMN)
+    sheet = quote_sheet(sheet_name)
+    scan_rows = min(HEADER_SCAN_ROWS, row_count)
+    with phase("sheets_fetch"):
+        result = spreadsheet.values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=[
+                f"{sheet}!{LABEL_COLUMN}1:{LABEL_COLUMN}{row_count}",
+                f"{sheet}!A1:{column_letter(column_count - 1)}{scan_rows}",
+            ],
+        ).execute()
+    label_values, header_values = (
+        value_range.get("values", []) for value_range in result.get("valueRanges", [{}, {}])
+    )
+
+    # The header row is the scanned row with the most month-like cells
+    header_row, months = None, {}
+    for row_index, row in enumerate(header_values):
+        row_months = {}
+        for col_index, cell in enumerate(row):
+            parsed = parse_month_header(cell)
+            if parsed and parsed not in row_months:
+                row_months[parsed] = col_index
+        if len(row_months) > len(months):
+            header_row, months = row_index, row_months
+    headers = (
+        {col: str(header_values[header_row][col]).strip() for col in months.values()}
+        if header_row is not None else {}
+    )
+
+    labels = [
+        (row_index, str(row[0]).strip())
+        for row_index, row in enumerate(label_values)
+        if row and str(row[0]).strip() and row_index != header_row
+    ]
+
+    return SheetMetadata(
+        sheet_name=sheet_name,
+        row_count=row_count,
+        column_count=column_count,
+        tab_names=list(tabs),
+        label_column=label_column,
+        header_row=header_row,
+        headers=headers,
+        months=months,
+        labels=labels,
+        sections=build_sections(labels),
+    )
+
+
+_metadata_cache: Dict[Tuple[str, str], Tuple[Optional[str], float, SheetMetadata]] = {}
+_metadata_lock = threading.Lock()
+
+
+def get_sheet_metadata(spreadsheet_id: str, sheet_name: str = DEFAULT_SHEET_NAME) -> SheetMetadata:
+    """Get tab metadata, re-reading it only when the spreadsheet revision changes."""
+    revision = get_sheet_revision(spreadsheet_id)
+    key = (spreadsheet_id, sheet_name)
+    now = time.monotonic()
+    with _metadata_lock:
+        cached = _metadata_cache.get(key)
+    if cached:
+        cached_revision, loaded_at, metadata = cached
+        if revision is not None and cached_revision == revision:
+            return metadata
+        if revision is None and now - loaded_at < METADATA_TTL_SECONDS:
+            return metadata
+
+    metadata = sheets_flight.do(
+        ("metadata", spreadsheet_id, sheet_name, revision),
+        partial(load_sheet_metadata, spreadsheet_id, sheet_name),
+    )
+    with _metadata_lock:
+        _metadata_cache[key] = (revision, now, metadata)
+    return metadata
+
+
+def plan_ranges(
+    metadata: SheetMetadata,
+    labels: List[str],
+    period: Optional[str] = None,
+    macro: Optional[str] = None,
+    micro: Optional[str] = None,
+) -> RangePlan:
+    """
+    Turn label names and a period into the minimal A1 ranges.
+
+    Consecutive matching rows and consecutive month columns are merged, so
+    "Revenue, Jan–Mar/25" becomes a single range such as 'Sheet1'!F7:H7.
+    Labels matched only case-insensitively or by substring are listed in the
+    plan's notes so callers can see that the match was widened.
+
+    Args:
+        metadata: Layout of the tab
+        labels: Row labels as they appear in the label column
+        period: Period such as "Jan–Mar/25"; all month columns when omitted
+        macro: Only keep rows under this macro line (e.g. "COGS", "Expenses")
+        micro: Only keep rows under this micro line (e.g. "SOFTWARE")
+
+    Returns:
+        RangePlan with the ranges to fetch and notes on widened matches
+
+    Raises:
+        ValueError: If a label or month is not in the sheet
+    """
+    if not labels:
+        raise ValueError("At least one label is required")
+    if not metadata.months:
+        raise ValueError(f"No month header row found in the first {HEADER_SCAN_ROWS} rows")
+
+    rows: List[Tuple[int, str]] = []
+    missing = []
+    notes = []
+    for label in labels:
+        matches, kind = metadata.find_rows(label)
+        matches = [(row, text) for row, text in matches if metadata.in_section(row, macro, micro)]
+        if not matches:
+            missing.append(label)
+        elif kind != "exact":
+            how = "by substring" if kind == "substring" else "ignoring case"
+            notes.append(
+                f"'{label}' has no exact match; matched {how}: "
+                + ", ".join(metadata.describe_row(row, text) for row, text in matches)
+            )
+        rows.extend(match for match in matches if match not in rows)
+    if missing:
+        section = " > ".join(part for part in (macro, micro) if part)
+        raise ValueError(
+            f"Labels not found{' under ' + section if section else ''}: {', '.join(missing)}; "
+            f"available: {', '.join(sorted({text for _, text in metadata.labels}))}"
+        )
+    rows.sort()
+
+    columns = metadata.find_columns(parse_period(period)) if period else sorted(metadata.months.values())
+
+    row_spans = _spans([row for row, _ in rows])
+    column_spans = _spans(columns)
+    sheet = quote_sheet(metadata.sheet_name)
+    ranges = [
+        f"{sheet}!{column_letter(first_col)}{first_row + 1}:{column_letter(last_col)}{last_row + 1}"
+        for first_row, last_row in row_spans
+        for first_col, last_col in column_spans
+    ]
+    return RangePlan(
+        ranges=ranges,
+        row_spans=row_spans,
+        column_spans=column_spans,
+        rows=rows,
+        columns=columns,
+        notes=notes,
+    )
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Pydantic models
+# ────────────────────────────────────────────────────────────────────────────────
+class SheetsLookupParams(BaseModel):
+    spreadsheet_id: str = Field(default=DEFAULT_SHEET_ID, description="Google Sheets file ID")
+    labels: List[str] = Field(..., description="Row labels from the label column (e.g. ['Revenue'])")
+    period: Optional[str] = Field(
+        default=None,
+        description="Months to return (e.g. 'Jan–Mar/25', 'Q1/25'); all months when omitted"
+    )
+    macro: Optional[str] = Field(
+        default=None,
+        description="Only rows under this macro line (e.g. 'COGS', 'Expenses')"
+    )
+    micro: Optional[str] = Field(
+        default=None,
+        description="Only rows under this ALL CAPS micro line (e.g. 'SOFTWARE')"
+    )
+    sheet_name: str = Field(default=DEFAULT_SHEET_NAME, description="Tab name")
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Function Tools
+# ────────────────────────────────────────────────────────────────────────────────
+def google_sheets_lookup(params: SheetsLookupParams) -> SheetsQueryReturn:
+    """
+    Fetch only the cells for the given labels and period.
+
+    Each row carries its macro and micro line, and widened label matches are
+    reported in the result's notes.
+    """
+    try:
+        metadata = get_sheet_metadata(params.spreadsheet_id, params.sheet_name)
+        plan = plan_ranges(metadata, params.labels, params.period, params.macro, params.micro)
+
+        revision = get_sheet_revision(params.spreadsheet_id)
+        # Timed inside the shared call so only the caller that runs it records the fetch
+        result = sheets_flight.do(
+            ("batch", params.spreadsheet_id, tuple(plan.ranges), revision),
+            timed("sheets_fetch", get_sheets_service().spreadsheets().values().batchGet(
+                spreadsheetId=params.spreadsheet_id,
+                ranges=plan.ranges,
+            ).execute),
+        )
+        value_ranges = iter(result.get("valueRanges", []))
+
+        cells: Dict[Tuple[int, int], str] = {}
+        for first_row, last_row in plan.row_spans:
+            for first_col, last_col in plan.column_spans:
+                values = next(value_ranges, {}).get("values", [])
+                for row_offset, row in enumerate(values):
+                    for col_offset, cell in enumerate(row[:last_col - first_col + 1]):
+                        cells[(first_row + row_offset, first_col + col_offset)] = cell
+
+        headers = [metadata.headers[col] for col in plan.columns]
+        records = [
+            [row + 1, label, *metadata.section(row)] + [cells.get((row, col), "") for col in plan.columns]
+            for row, label in plan.rows
+        ]
+        with phase("normalize"):
+            df = pd.DataFrame(records, columns=["row", "label", "macro", "micro"] + headers)
+            df = coerce_numeric(df)
+            result = SheetsQueryReturn.from_frame(df)
+        result.notes = plan.notes
+        return result
+
+    except ValueError as e:
+        raise SheetsQueryError(str(e))
+    except SheetsQueryError:
+        raise
+    except HttpError as e:
+        raise SheetsQueryError(f"Google Sheets API error: {str(e)}")
+    except Exception as e:
+        raise SheetsQueryError(f"Lookup failed: {str(e)}")
@@ -0,0 +1,224 @@
+"""Sheet-level revision history for the Google Sheets tools.
+
+Whenever the agent reads a spreadsheet, one snapshot of the whole tab (every
+labelled row and month column, located with the range planner's metadata) is
+stored per revision, whichever tool did the read. Diffs are sliced to the
+requested A1 range afterwards, so any two revisions can be compared no matter
+which ranges or lookups were used to fetch them.
+
+Snapshots are taken on a background thread and at most once per revision;
+when the Drive revision is unknown, at most once per SNAPSHOT_MIN_INTERVAL_S.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, Field
+
+from tools.google_sheets import (
+    DEFAULT_SHEET_ID,
+    DEFAULT_SHEET_NAME,
+    SheetsQueryError,
+    coerce_numeric,
+    column_letter,
+    get_sheet_revision,
+    get_sheets_service,
+    parse_a1_range,
+    sheets_flight,
+)
+from tools.range_planner import get_sheet_metadata, quote_sheet
+from tools.snapshot_store import SnapshotError, SnapshotStore, diff_frames, get_snapshot_store
+from tools.timing import phase
+
+logger = logging.getLogger(__name__)
+
+# Minimum time between snapshots of a tab whose Drive revision is unknown
+SNAPSHOT_MIN_INTERVAL_S = float(os.getenv("SHEETS_SNAPSHOT_MIN_INTERVAL_S", "300"))
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Pydantic Models
+# ────────────────────────────────────────────────────────────────────────────────
+class SheetsDiffParams(BaseModel):
+    spreadsheet_id: str = Field(default=DEFAULT_SHEET_ID, description="Google Sheets file ID")
+    sheet_name: str = Field(default=DEFAULT_SHEET_NAME, description="Tab to compare")
+    a1_range: Optional[str] = Field(
+        default=None,
+        description="Only compare cells inside this range (e.g. 'Sheet1!E1:H90'); whole tab when omitted"
+    )
+    base: str = Field(
+        ...,
+        description="Older revision: a revision ID, 'previous', or an ISO date meaning the "
+                    "revision current at that time (e.g. '2025-03-10')"
+    )
+    target: str = Field(
+        default="current",
+        description="Newer revision: 'current' (read now), 'latest', a revision ID or an ISO date"
+    )
+    max_changes: int = Field(default=100, description="Maximum changed cells to return")
+
+
+class SheetsDiffReturn(BaseModel):
+    base: Dict = Field(..., description="Older snapshot (revision, seen_at, rows, columns)")
+    target: Dict = Field(..., description="Newer snapshot (revision, seen_at, rows, columns)")
+    changed_cells: int = Field(..., description="Total number of changed numeric cells")
+    changes: List[Dict] = Field(..., description="Changed cells, largest absolute change first")
+    added_rows: List[str] = Field(default_factory=list, description="Row labels only in target")
+    removed_rows: List[str] = Field(default_factory=list, description="Row labels only in base")
+    added_columns: List[str] = Field(default_factory=list, description="Columns only in target")
+    removed_columns: List[str] = Field(default_factory=list, description="Columns only in base")
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Snapshots
+# ────────────────────────────────────────────────────────────────────────────────
+def load_sheet_frame(spreadsheet_id: str, sheet_name: str = DEFAULT_SHEET_NAME) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Read a whole tab as a frame of labelled rows and month columns.
+
+    Returns:
+        Tuple of (frame with "row", "label" and one column per month header,
+        zero-based sheet column of each label/month column)
+    """
+    metadata = get_sheet_metadata(spreadsheet_id, sheet_name)
+    with phase("sheets_fetch"):
+        values = get_sheets_service().spreadsheets().values().get(
+            spreadsheetId=spreadsheet_id,
+            range=f"{quote_sheet(sheet_name)}!A1:{column_letter(metadata.column_count - 1)}{metadata.row_count}",
+        ).execute().get("values", [])
+
+    columns = sorted(metadata.headers)
+    records = []
+    for row, label in metadata.labels:
+        cells = values[row] if row < len(values) else []
+        records.append([row + 1, label] + [cells[col] if col < len(cells) else "" for col in columns])
+    df = coerce_numeric(pd.DataFrame(records, columns=["row", "label"] + [metadata.headers[c] for c in columns]))
+
+    positions = {"label": metadata.label_column, **{metadata.headers[c]: c for c in columns}}
+    return df, positions
+
+
+_captured: Dict[Tuple[str, str], Tuple[Optional[str], float]] = {}
+_captured_lock = threading.Lock()
+
+
+def capture_snapshot(spreadsheet_id: str, sheet_name: str = DEFAULT_SHEET_NAME) -> Optional[str]:
+    """
+    Store the current revision of a tab unless it is already stored.
+
+    Returns:
+        The current revision ID, or None when snapshots are disabled
+    """
+    store = get_snapshot_store()
+    if store is None:
+        return None
+    revision = get_sheet_revision(spreadsheet_id)
+    key = (spreadsheet_id, sheet_name)
+    now = time.monotonic()
+    with _captured_lock:
+        captured = _captured.get(key)
+    if captured:
+        captured_revision, captured_at = captured
+        if revision is not None and captured_revision == revision:
+            return revision
+        if revision is None and now - captured_at < SNAPSHOT_MIN_INTERVAL_S:
+            return captured_revision
+
+    stored = sheets_flight.do(
+        ("snapshot", spreadsheet_id, sheet_name, revision),
+        partial(_capture, store, spreadsheet_id, sheet_name, revision),
+    )
+    with _captured_lock:
+        # Keyed by Drive revision: a version bump elsewhere in the file stores
+        # nothing new, but must not make every later call re-read the tab
+        _captured[key] = (revision or stored, now)
+    return stored
+
+
+def _capture(store: SnapshotStore, spreadsheet_id: str, sheet_name: str, revision: Optional[str]) -> str:
+    if revision is not None and store.latest(spreadsheet_id, sheet_name) == revision:
+        # Already stored by an earlier process
+        return revision
+    df, positions = load_sheet_frame(spreadsheet_id, sheet_name)
+    return store.save(spreadsheet_id, sheet_name, revision, df, positions)
+
+
+# One thread keeps snapshot writes off the request path and serialised
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sheet-history")
+
+
+def schedule_snapshot(spreadsheet_id: str, sheet_name: str = DEFAULT_SHEET_NAME) -> None:
+    """Capture a snapshot in the background; history is best effort and never fails a request."""
+    if get_snapshot_store() is None:
+        return
+
+    def capture():
+        try:
+            capture_snapshot(spreadsheet_id, sheet_name)
+        except Exception as e:
+            logger.warning(f"Could not store snapshot of {sheet_name}: {str(e)}")
+
+    _executor.submit(capture)
+
+
+def _slice(df: pd.DataFrame, positions: Dict[str, int], a1_range: Optional[str]) -> pd.DataFrame:
+    """Keep the cells inside an A1 range; the label column is always kept for alignment."""
+    if a1_range:
+        _, (first_row, first_col, last_row, last_col) = parse_a1_range(a1_range)
+        rows = df["row"].to_numpy() - 1
+        mask = (rows >= (first_row or 0)) & (rows <= (last_row if last_row is not None else np.inf))
+        columns = [
+            name for name in df.columns
+            if name == "label" or (
+                name in positions
+                and positions[name] >= (first_col or 0)
+                and (last_col is None or positions[name] <= last_col)
+            )
+        ]
+        df = df.loc[mask, columns]
+    # Row numbers shift when rows are inserted; they are not content
+    return df.drop(columns=["row"], errors="ignore").reset_index(drop=True)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Function Tools
+# ────────────────────────────────────────────────────────────────────────────────
+def google_sheets_diff(params: SheetsDiffParams) -> SheetsDiffReturn:
+    """Compare two stored revisions of a tab, optionally restricted to a range."""
+    store = get_snapshot_store()
+    if store is None:
+        raise SheetsQueryError("Snapshot history is disabled (SHEETS_SNAPSHOT_DIR is empty)")
+    sheet_name = params.sheet_name
+    try:
+        if params.a1_range:
+            sheet_name = parse_a1_range(params.a1_range)[0] or sheet_name
+        if params.target == "current":
+            capture_snapshot(params.spreadsheet_id, sheet_name)
+            target = store.resolve(params.spreadsheet_id, sheet_name, "latest")
+        else:
+            target = store.resolve(params.spreadsheet_id, sheet_name, params.target)
+        base = store.resolve(params.spreadsheet_id, sheet_name, params.base)
+
+        snapshots = {info.revision: info for info in store.list(params.spreadsheet_id, sheet_name)}
+        frames = [
+            _slice(store.load(params.spreadsheet_id, sheet_name, revision),
+                   snapshots[revision].positions, params.a1_range)
+            for revision in (base, target)
+        ]
+        result = diff_frames(*frames, max_changes=params.max_changes)
+        return SheetsDiffReturn(
+            base=snapshots[base].as_dict(),
+            target=snapshots[target].as_dict(),
+            **result,
+        )
+    except ValueError as e:
+        raise SheetsQueryError(str(e))
+    except SnapshotError as e:
+        raise SheetsQueryError(str(e))
@@ -0,0 +1,431 @@
+"""Versioned local store of spreadsheet revisions.
+
+One columnar snapshot of a whole tab is stored per revision (see
+tools/sheet_history.py): each column is a content-addressed block, so
+columns that did not change between revisions are stored once. Numeric blocks
+are plain .npy files that are memory-mapped on read; text blocks (labels) are
+small and kept zlib-compressed. Manifests are gzip-compressed JSON.
+
+    {root}/blocks/ab/<sha256>.npy        numeric column, memory-mapped
+    {root}/blocks/cd/<sha256>.npy.z      text column, compressed
+    {root}/sheets/<key>/<revision>.json.gz
+    {root}/sheets/<key>/HISTORY          "<timestamp> <revision>" per change
+
+HISTORY records every time the tab's content changed to a different revision
+(a new Drive version with identical tab content is not an entry), so a
+revision the content returns to (A -> B -> A) is ordered by when it was last
+current, not by when it was first stored. Only the newest RETENTION history
+entries are kept; manifests no longer referenced and their unshared blocks
+are deleted. Locking is per process: run one writer per directory.
+
+diff_frames() compares two revisions with vectorised NumPy operations so
+period-over-period questions never re-download history.
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_DIR = os.getenv("SHEETS_SNAPSHOT_DIR", "snapshots")
+
+# History entries (revision changes) kept per tab
+SNAPSHOT_RETENTION = int(os.getenv("SHEETS_SNAPSHOT_RETENTION", "50"))
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot cannot be found or read."""
+    pass
+
+
+@dataclass
+class SnapshotInfo:
+    """A stored revision of one tab."""
+    revision: str
+    seen_at: float
+    rows: int
+    columns: List[str]
+    positions: Dict[str, int] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict:
+        return {
+            "revision": self.revision,
+            "seen_at": datetime.fromtimestamp(self.seen_at, timezone.utc).isoformat(),
+            "rows": self.rows,
+            "columns": self.columns,
+        }
+
+
+def _numeric_column(column: pd.Series) -> Optional[np.ndarray]:
+    """Return the column as float64 if every non-blank cell is numeric, else None."""
+    if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+        return column.to_numpy(dtype=np.float64)
+    text = column.astype(str).str.strip().str.replace(",", "", regex=False)
+    blank = text.eq("") | column.isna().to_numpy()
+    numbers = pd.to_numeric(text.mask(blank), errors="coerce")
+    if numbers.isna().to_numpy()[~blank.to_numpy()].any():
+        return None
+    return numbers.to_numpy(dtype=np.float64)
+
+
+def content_revision(df: pd.DataFrame) -> str:
+    """Revision ID derived from content, for sheets whose Drive version is unknown."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(c) for c in df.columns]).encode())
+    for i in range(df.shape[1]):
+        digest.update(json.dumps(df.iloc[:, i].astype(str).tolist()).encode())
+    return "sha-" + digest.hexdigest()[:16]
+
+
+def row_keys(df: pd.DataFrame) -> np.ndarray:
+    """
+    Stable row identities for aligning revisions.
+
+    Rows are keyed by the first text column (the label) plus the occurrence
+    number of that label, since labels such as "Technology" repeat under every
+    micro line. Frames without a text column are keyed by position.
+    """
+    label_column = next(
+        (i for i in range(df.shape[1]) if _numeric_column(df.iloc[:, i]) is None), None
+    )
+    if label_column is None:
+        return np.array([f"#{i}" for i in range(len(df))], dtype=object)
+    labels = df.iloc[:, label_column].astype(str).str.strip()
+    occurrence = labels.groupby(labels).cumcount()
+    return (labels + "#" + occurrence.astype(str)).to_numpy(dtype=object)
+
+
+class SnapshotStore:
+    """Content-addressed, columnar snapshot store on the local filesystem."""
+
+    def __init__(self, root: str = SNAPSHOT_DIR, retention: int = SNAPSHOT_RETENTION):
+        self.root = root
+        self.retention = retention
+        self._lock = threading.RLock()
+
+    def _sheet_dir(self, spreadsheet_id: str, sheet_name: str) -> str:
+        key = hashlib.sha1(f"{spreadsheet_id}\n{sheet_name}".encode()).hexdigest()[:16]
+        return os.path.join(self.root, "sheets", key)
+
+    @staticmethod
+    def _revision_file(revision: str) -> str:
+        return re.sub(r"[^A-Za-z0-9._-]", "_", revision) + ".json.gz"
+
+    def _block_path(self, digest: str, suffix: str) -> str:
+        return os.path.join(self.root, "blocks", digest[:2], digest + suffix)
+
+    @staticmethod
+    def _write_atomic(path: str, payload: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+
+    def _write_block(self, array: np.ndarray, compress: bool) -> Tuple[str, bool]:
+        buffer = io.BytesIO()
+        np.save(buffer, array, allow_pickle=False)
+        payload = buffer.getvalue()
+        digest = hashlib.sha256(payload).hexdigest()
+        suffix = ".npy.z" if compress else ".npy"
+        path = self._block_path(digest, suffix)
+        if os.path.exists(path):
+            return digest, False
+        self._write_atomic(path, zlib.compress(payload) if compress else payload)
+        return digest, True
+
+    def save(
+        self,
+        spreadsheet_id: str,
+        sheet_name: str,
+        revision: Optional[str],
+        df: pd.DataFrame,
+        positions: Optional[Dict[str, int]] = None,
+    ) -> str:
+        """
+        Store a revision of a tab and record it as the current one.
+
+        Args:
+            spreadsheet_id: Google Sheets file ID
+            sheet_name: Tab the frame was read from
+            revision: Drive revision, or None to derive one from the content
+            df: The normalised frame of the tab
+            positions: Zero-based sheet column of each frame column, used to
+                slice snapshots by A1 range
+
+        Returns:
+            The revision ID the snapshot is stored under; the latest stored
+            revision when the tab's content has not changed since
+        """
+        revision = revision or content_revision(df)
+        sheet_dir = self._sheet_dir(spreadsheet_id, sheet_name)
+        manifest_path = os.path.join(sheet_dir, self._revision_file(revision))
+        positions = positions or {}
+
+        with self._lock:
+            columns = []
+            for i, name in enumerate(df.columns):
+                values = _numeric_column(df.iloc[:, i])
+                if values is not None:
+                    digest, _ = self._write_block(values, compress=False)
+                    column = {"name": str(name), "kind": "numeric", "block": digest}
+                else:
+                    text = df.iloc[:, i].fillna("").astype(str).to_numpy(dtype=str)
+                    digest, _ = self._write_block(text, compress=True)
+                    column = {"name": str(name), "kind": "text", "block": digest}
+                if str(name) in positions:
+                    column["position"] = positions[str(name)]
+                columns.append(column)
+
+            history = self.history(spreadsheet_id, sheet_name)
+            if history and history[-1][1] != revision:
+                # The Drive version changes on edits anywhere in the file; only
+                # a change to this tab's blocks is a new entry in its history
+                try:
+                    latest = self._manifest(spreadsheet_id, sheet_name, history[-1][1])
+                except SnapshotError:
+                    latest = None
+                if latest is not None and latest["columns"] == columns:
+                    return history[-1][1]
+
+            if not os.path.exists(manifest_path):
+                manifest = {
+                    "spreadsheet_id": spreadsheet_id,
+                    "sheet_name": sheet_name,
+                    "revision": revision,
+                    "rows": len(df),
+                    "columns": columns,
+                }
+                self._write_atomic(manifest_path, gzip.compress(json.dumps(manifest).encode()))
+
+            if not history or history[-1][1] != revision:
+                history.append((time.time(), revision))
+                if len(history) > self.retention:
+                    history = history[-self.retention:]
+                    self._write_history(sheet_dir, history)
+                    self._prune(sheet_dir, {rev for _, rev in history})
+                else:
+                    with open(os.path.join(sheet_dir, "HISTORY"), "a") as f:
+                        f.write(f"{history[-1][0]:.6f} {revision}\n")
+        return revision
+
+    def _write_history(self, sheet_dir: str, history: List[Tuple[float, str]]) -> None:
+        payload = "".join(f"{seen_at:.6f} {revision}\n" for seen_at, revision in history)
+        self._write_atomic(os.path.join(sheet_dir, "HISTORY"), payload.encode())
+
+    def _prune(self, sheet_dir: str, keep: set) -> None:
+        """Delete manifests outside the history, then blocks no manifest references."""
+        for name in os.listdir(sheet_dir):
+            if name.endswith(".json.gz") and name not in {self._revision_file(rev) for rev in keep}:
+                os.remove(os.path.join(sheet_dir, name))
+
+        referenced = set()
+        sheets_root = os.path.join(self.root, "sheets")
+        for directory, _, files in os.walk(sheets_root):
+            for name in files:
+                if name.endswith(".json.gz"):
+                    with open(os.path.join(directory, name), "rb") as f:
+                        manifest = json.loads(gzip.decompress(f.read()))
+                    referenced.update(column["block"] for column in manifest["columns"])
+        for directory, _, files in os.walk(os.path.join(self.root, "blocks")):
+            for name in files:
+                if name.split(".", 1)[0] not in referenced:
+                    os.remove(os.path.join(directory, name))
+
+    def history(self, spreadsheet_id: str, sheet_name: str) -> List[Tuple[float, str]]:
+        """(timestamp, revision) for every change of revision, oldest first."""
+        path = os.path.join(self._sheet_dir(spreadsheet_id, sheet_name), "HISTORY")
+        try:
+            with open(path) as f:
+                lines = f.read().split("\n")
+        except FileNotFoundError:
+            return []
+        history = []
+        for line in lines:
+            seen_at, _, revision = line.partition(" ")
+            if revision:
+                history.append((float(seen_at), revision))
+        return history
+
+    def _manifest(self, spreadsheet_id: str, sheet_name: str, revision: str) -> Dict:
+        path = os.path.join(self._sheet_dir(spreadsheet_id, sheet_name), self._revision_file(revision))
+        try:
+            with open(path, "rb") as f:
+                return json.loads(gzip.decompress(f.read()))
+        except FileNotFoundError:
+            raise SnapshotError(f"No snapshot of {sheet_name} at revision {revision}")
+
+    def list(self, spreadsheet_id: str, sheet_name: str) -> List[SnapshotInfo]:
+        """Stored revisions of a tab, ordered by when each was last current (oldest first)."""
+        last_seen: Dict[str, float] = {}
+        for seen_at, revision in self.history(spreadsheet_id, sheet_name):
+            last_seen[revision] = seen_at
+        snapshots = []
+        for revision, seen_at in last_seen.items():
+            manifest = self._manifest(spreadsheet_id, sheet_name, revision)
+            snapshots.append(SnapshotInfo(
+                revision=revision,
+                seen_at=seen_at,
+                rows=manifest["rows"],
+                columns=[column["name"] for column in manifest["columns"]],
+                positions={
+                    column["name"]: column["position"]
+                    for column in manifest["columns"] if "position" in column
+                },
+            ))
+        return sorted(snapshots, key=lambda info: info.seen_at)
+
+    def latest(self, spreadsheet_id: str, sheet_name: str) -> Optional[str]:
+        """The current revision of a tab as last recorded."""
+        history = self.history(spreadsheet_id, sheet_name)
+        return history[-1][1] if history else None
+
+    def load(self, spreadsheet_id: str, sheet_name: str, revision: str) -> pd.DataFrame:
+        """Load a revision; numeric columns are backed by read-only memory maps."""
+        manifest = self._manifest(spreadsheet_id, sheet_name, revision)
+        data = {}
+        for column in manifest["columns"]:
+            if column["kind"] == "numeric":
+                data[column["name"]] = np.load(self._block_path(column["block"], ".npy"), mmap_mode="r")
+            else:
+                with open(self._block_path(column["block"], ".npy.z"), "rb") as f:
+                    payload = zlib.decompress(f.read())
+                data[column["name"]] = np.load(io.BytesIO(payload), allow_pickle=False)
+        return pd.DataFrame(data, copy=False)
+
+    def resolve(self, spreadsheet_id: str, sheet_name: str, ref: str) -> str:
+        """
+        Resolve a revision reference.
+
+        Args:
+            ref: A stored revision ID; "latest"; "previous" (the revision that
+                was current before the latest one); or an ISO date/datetime,
+                meaning the revision that was current at that moment
+
+        Returns:
+            The stored revision ID
+
+        Raises:
+            SnapshotError: If nothing matches
+        """
+        history = self.history(spreadsheet_id, sheet_name)
+        if not history:
+            raise SnapshotError(f"No snapshots stored for {sheet_name}")
+        revisions = [revision for _, revision in history]
+
+        if ref in revisions:
+            return ref
+        if ref == "latest":
+            return revisions[-1]
+        if ref == "previous":
+            # Consecutive history entries always differ
+            if len(revisions) < 2:
+                raise SnapshotError(f"Only one revision of {sheet_name} is stored so far")
+            return revisions[-2]
+
+        try:
+            moment = datetime.fromisoformat(ref)
+        except ValueError:
+            raise SnapshotError(
+                f"Unknown revision '{ref}'; stored: {', '.join(dict.fromkeys(reversed(revisions)))}"
+            )
+        if len(ref) <= 10:
+            # A bare date covers the whole day
+            moment = moment.replace(hour=23, minute=59, second=59)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        cutoff = moment.timestamp()
+        candidates = [revision for seen_at, revision in history if seen_at <= cutoff]
+        if not candidates:
+            oldest = datetime.fromtimestamp(history[0][0], timezone.utc).isoformat()
+            raise SnapshotError(f"No snapshot of {sheet_name} on or before {ref}; oldest is from {oldest}")
+        return candidates[-1]
+
+
+def diff_frames(base: pd.DataFrame, target: pd.DataFrame, max_changes: int = 100, tolerance: float = 1e-9) -> Dict:
+    """
+    Compare two revisions of a tab cell by cell.
+
+    Rows are aligned by row_keys() and columns by name; numeric cells are
+    compared with vectorised NumPy operations and blanks count as zero.
+
+    Args:
+        base: The older revision
+        target: The newer revision
+        max_changes: Maximum number of changed cells to list (largest first)
+        tolerance: Absolute difference below which cells count as unchanged
+
+    Returns:
+        Dict with changed cells, the total number of changed cells, and added
+        or removed rows and columns
+    """
+    base_keys, target_keys = row_keys(base), row_keys(target)
+    base_index = pd.Index(base_keys)
+    positions = base_index.get_indexer(target_keys)
+    matched = positions >= 0
+    target_rows = np.flatnonzero(matched)
+    base_rows = positions[matched]
+    keys = target_keys[matched]
+
+    base_columns = {str(c): i for i, c in enumerate(base.columns)}
+    changes = []
+    total = 0
+    for j, name in enumerate(target.columns):
+        name = str(name)
+        if name not in base_columns:
+            continue
+        before = _numeric_column(base.iloc[:, base_columns[name]])
+        after = _numeric_column(target.iloc[:, j])
+        if before is None or after is None:
+            continue
+        a = np.nan_to_num(before[base_rows])
+        b = np.nan_to_num(after[target_rows])
+        delta = b - a
+        changed = np.flatnonzero(np.abs(delta) > tolerance)
+        total += len(changed)
+        for i in changed:
+            label, _, occurrence = keys[i].rpartition("#")
+            changes.append({
+                "row": label,
+                "occurrence": int(occurrence) if occurrence.isdigit() else 0,
+                "column": name,
+                "before": float(a[i]),
+                "after": float(b[i]),
+                "delta": float(delta[i]),
+                "pct_change": round(float(delta[i] / abs(a[i]) * 100), 2) if a[i] else None,
+            })
+
+    changes.sort(key=lambda change: abs(change["delta"]), reverse=True)
+    target_key_set = set(target_keys)
+    return {
+        "changed_cells": total,
+        "changes": changes[:max_changes],
+        "added_rows": [key.rpartition("#")[0] for key in target_keys[~matched]],
+        "removed_rows": [key.rpartition("#")[0] for key in base_keys if key not in target_key_set],
+        "added_columns": [str(c) for c in target.columns if str(c) not in base_columns],
+        "removed_columns": [c for c in base_columns if c not in {str(t) for t in target.columns}],
+    }
+
+
+_store: Optional[SnapshotStore] = None
+
+
+def get_snapshot_store() -> Optional[SnapshotStore]:
+    """The process-wide store, or None when SHEETS_SNAPSHOT_DIR is set to an empty string."""
+    global _store
+    if not SNAPSHOT_DIR:
+        return None
+    if _store is None:
+        _store = SnapshotStore(SNAPSHOT_DIR)
+    return _store
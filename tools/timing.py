@@ -0,0 +1,78 @@
+"""Wall-clock phase timing for profiled requests.
+
+Code on the request path marks its phases (OpenAI calls, Sheets fetches,
+DataFrame normalisation, JSON encoding) with phase(). Nothing is recorded
+unless a PhaseTimer has been activated for the current context, which the
+profiler in app/profiling.py does for sampled requests; otherwise phase() is
+a single ContextVar lookup.
+
+Only time a call where it actually runs: wrap the function handed to
+SingleFlight.do() with timed() so the leader records the fetch and callers
+waiting on it do not.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Dict, Iterator, Optional
+
+
+class PhaseTimer:
+    """Accumulates wall-clock time per phase and the threads that ran them."""
+
+    def __init__(self):
+        self.threads: Dict[int, str] = {}
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def add_thread(self, ident: int) -> None:
+        if ident not in self.threads:
+            with self._lock:
+                self.threads[ident] = threading.current_thread().name
+
+    def add_phase(self, name: str, elapsed_s: float) -> None:
+        with self._lock:
+            entry = self.phases.setdefault(name, {"calls": 0, "wall_s": 0.0})
+            entry["calls"] += 1
+            entry["wall_s"] += elapsed_s
+
+
+_current: ContextVar[Optional[PhaseTimer]] = ContextVar("current_phase_timer", default=None)
+
+
+def activate(timer: PhaseTimer) -> Token:
+    """Record phases of the current context (and threads started from it) on timer."""
+    return _current.set(timer)
+
+
+def deactivate(token: Token) -> None:
+    _current.reset(token)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """
+    Record wall-clock time for a phase on the active timer.
+
+    Also registers the calling thread, so profilers know which threads to
+    sample. A no-op when no timer is active.
+    """
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    timer.add_thread(threading.get_ident())
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add_phase(name, time.perf_counter() - started)
+
+
+def timed(name: str, fn: Callable[[], Any]) -> Callable[[], Any]:
+    """Wrap fn so that calling it is recorded as phase name."""
+    def wrapper():
+        with phase(name):
+            return fn()
+    return wrapper